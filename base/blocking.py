@@ -0,0 +1,116 @@
+""" Stops the browser downloading resources that are not needed to find the links on a page """
+import re
+from urllib.parse import urlsplit
+
+# File extensions blocked by each profile category
+EXTENSIONS = {
+    "images": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp", "avif"],
+    "fonts": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "ogg", "mp3", "wav", "m4a", "mov", "avi", "m3u8"],
+}
+
+# Hosts blocked by each profile category, subdomains are blocked with them
+HOSTS = {
+    "analytics": [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "analytics.google.com",
+        "hotjar.com",
+        "segment.io",
+        "segment.com",
+        "mixpanel.com",
+        "clarity.ms",
+        "newrelic.com",
+        "nr-data.net",
+        "scorecardresearch.com",
+        "quantserve.com",
+        "fullstory.com",
+        "mouseflow.com",
+    ],
+    "ads": [
+        "doubleclick.net",
+        "googlesyndication.com",
+        "googleadservices.com",
+        "adservice.google.com",
+        "amazon-adsystem.com",
+        "adnxs.com",
+        "criteo.com",
+        "criteo.net",
+        "taboola.com",
+        "outbrain.com",
+        "connect.facebook.net",
+        "ads-twitter.com",
+        "pubmatic.com",
+        "rubiconproject.com",
+    ],
+}
+
+
+class BlockingProfile:
+    def __init__(self, categories=(), hosts=()):
+        """BlockingProfile:
+        Use: .apply to install the profile on a driver
+        Use: .blocks to test a url against the profile
+        :param categories: Any of images, fonts, media, analytics, ads, or all for every one of them
+        :param hosts: Extra hosts to block along with their subdomains"""
+        if "all" in categories:
+            categories = list(EXTENSIONS) + list(HOSTS)
+        unknown = [category for category in categories if category not in EXTENSIONS and category not in HOSTS]
+        if unknown:
+            raise Exception(f"Unknown 'block' categories {unknown}, use {'|'.join(list(EXTENSIONS) + list(HOSTS))} or all")
+
+        self.extensions = sorted({extension for category in categories for extension in EXTENSIONS.get(category, [])})
+        self.hosts = sorted({host for category in categories for host in HOSTS.get(category, [])} | set(hosts))
+
+        # One regex for the path and one for the host, tested once per request rather than a list of checks. Extensions
+        # are only looked for in the path so a page such as /view?file=a.jpg is not taken for an image
+        self.extension_pattern = re.compile(rf"\.(?:{'|'.join(self.extensions)})$", re.IGNORECASE) if self.extensions else None
+        self.host_regex = rf"^[a-z]+://(?:[^/?#]*\.)?(?:{'|'.join(re.escape(host) for host in self.hosts)})(?::\d+)?(?:[/?#]|$)" if self.hosts else None
+        self.host_pattern = re.compile(self.host_regex, re.IGNORECASE) if self.hosts else None
+
+    def __bool__(self):
+        return self.extension_pattern is not None or self.host_pattern is not None
+
+    def blocks(self, url):
+        """Returns true if the profile blocks the url"""
+        if self.host_pattern is not None and self.host_pattern.search(url) is not None:
+            return True
+        return self.extension_pattern is not None and self.extension_pattern.search(urlsplit(url).path) is not None
+
+    def url_patterns(self):
+        """Returns the profile as wildcard patterns for Chrome's Network.setBlockedURLs, the wildcards cannot tell the path
+        from the query so a url whose query ends in a blocked extension is blocked as well"""
+        patterns = []
+        for extension in self.extensions:
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+        for host in self.hosts:
+            patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+        return patterns
+
+    def interceptor(self, request):
+        """selenium-wire request interceptor, used where the browser cannot block urls itself"""
+        if self.blocks(request.url):
+            request.abort()
+
+    def apply(self, browser, browser_name):
+        """Blocks the profile's urls inside Chrome so they never reach the proxy, other browsers fall back to
+        aborting them in the selenium-wire request interceptor. selenium-wire only intercepts the requests in its scopes,
+        so the blocked hosts are added to them, blocked extensions are only caught on hosts that are already in scope
+        :param browser: Driver to install the profile on
+        :param browser_name: 'Chrome' or 'Firefox'"""
+        if not self:
+            return
+        if browser_name == "Chrome":
+            from selenium.common.exceptions import WebDriverException  # profiles can be built and tested without selenium
+
+            try:
+                browser.execute_cdp_cmd("Network.enable", {})
+                browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.url_patterns()})
+                return
+            except WebDriverException:
+                pass  # No DevTools access, e.g. through a remote grid
+        if hasattr(browser, "request_interceptor"):  # Without the selenium-wire proxy there is nothing to fall back to
+            browser.request_interceptor = self.interceptor
+            scopes = browser.scopes
+            if scopes and self.host_regex is not None:  # No scopes means every request is already intercepted
+                browser.scopes = ([scopes] if isinstance(scopes, str) else list(scopes)) + [self.host_regex]
@@ -0,0 +1,72 @@
+""" Long lived buffered writers for the step and result logs, flushed on an interval and at exit """
+import atexit
+import threading
+
+
+class BufferedWriter:
+    writers = {}  # one writer per path, shared by every worker
+    registry_lock = threading.Lock()
+    flush_interval = 1.0  # seconds between background flushes
+    flusher = None
+    stop = None  # set by close_all to end the background flusher
+
+    def __init__(self, path):
+        """BufferedWriter:
+        Use: BufferedWriter.get to get the shared writer for a path rather than creating one directly
+        Use: .write to append text, it reaches the disk on the next flush
+        :param path: File to append to"""
+        self.path = path
+        self.file = open(path, "a", buffering=65536)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path):
+        """Gets the writer for a path, opening it and starting the background flusher the first time
+        :return: The writer"""
+        with cls.registry_lock:
+            if path not in cls.writers:
+                cls.writers[path] = cls(path)
+            if cls.flusher is None:
+                cls.stop = threading.Event()
+                cls.flusher = threading.Thread(target=cls._flush_loop, args=(cls.stop,), name="log-flusher", daemon=True)
+                cls.flusher.start()
+            return cls.writers[path]
+
+    def write(self, text):
+        with self.lock:
+            if not self.file.closed:  # Lines written after close_all, e.g. by a thread still finishing at exit, are dropped
+                self.file.write(text)
+
+    def flush(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+
+    @classmethod
+    def _flush_loop(cls, stop):
+        """Flushes every writer on the interval until close_all sets the stop event"""
+        while not stop.wait(cls.flush_interval):
+            cls.flush_all()
+
+    @classmethod
+    def flush_all(cls):
+        with cls.registry_lock:
+            writers = list(cls.writers.values())
+        for writer in writers:
+            writer.flush()
+
+    @classmethod
+    def close_all(cls):
+        """Flushes and closes every writer, registered to run at exit including when the program crashes"""
+        with cls.registry_lock:
+            writers = list(cls.writers.values())
+            cls.writers = {}
+            if cls.stop is not None:
+                cls.stop.set()
+            cls.flusher = None
+        for writer in writers:
+            with writer.lock:
+                writer.file.close()
+
+
+atexit.register(BufferedWriter.close_all)
@@ -0,0 +1,43 @@
+""" Periodically saves crawl state to disk so a long crawl can be resumed after the process dies """
+import gzip
+import json
+import os
+import time
+
+
+class Checkpoint:
+    def __init__(self, path, interval=60):
+        """Checkpoint:
+        Use: .due to find out if enough time has passed since the last save
+        Use: .save to write the state and .load to read it back
+        :param path: Location of the checkpoint file, written as gzipped JSON
+        :param interval: Minimum number of seconds between saves"""
+        self.path = path
+        self.interval = interval
+        self.last_saved = time.monotonic()
+
+    def due(self):
+        """Returns true if the interval has passed since the last save"""
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def save(self, state):
+        """Writes the state to a temporary file first so a crash part way through never corrupts the last checkpoint
+        :param state: Dictionary of JSON serialisable crawl state"""
+        temp_path = self.path + ".tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            json.dump(state, file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+        self.last_saved = time.monotonic()
+
+    def load(self):
+        """Reads the last saved state
+        :return: The state dictionary, or None if there is no checkpoint"""
+        if not os.path.isfile(self.path):
+            return None
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            return json.load(file)
+
+    def remove(self):
+        """Deletes the checkpoint once the crawl has finished"""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,139 @@
+""" Runtime arguments parsed once into typed values """
+import sys
+
+
+def parse_args(argv):
+    """Splits key:value runtime arguments, the first occurrence of a key wins
+    :param argv: List of arguments such as sys.argv
+    :return: {key: value}"""
+    args = {}
+    for i in argv:
+        if ":" in i:
+            key, value = i.split(":", maxsplit=1)
+            args.setdefault(key, value)
+    return args
+
+
+def _int(value, default=None):
+    return int(value) if value else default
+
+
+def _float(value, default=None):
+    return float(value) if value else default
+
+
+def _list(value):
+    return value.split("|") if value else None
+
+
+class Config:
+    def __init__(self, argv=None):
+        """Config:
+        Use: the attributes below, read straight off the object, instead of scanning sys.argv on every call
+        Use: .load to parse a different set of arguments, e.g. when Scraper is used as a library
+        Use: .get for arguments that are not listed below
+        :param argv: List of key:value arguments, defaults to sys.argv"""
+        self.load(sys.argv if argv is None else argv)
+
+    def load(self, argv):
+        """Parses the arguments in place, so modules holding on to the shared config see the new values"""
+        self.args = parse_args(argv)
+        get = self.args.get
+
+        # Browser
+        self.browser = get("browser")  # 'Chrome' or 'Firefox'
+        self.url = get("url")  # url the crawl starts from, links containing it are internal
+        self.headless = get("headless") != "n"
+        self.user = get("user")  # basic auth credentials
+        self.password = get("pass")
+        self.quick = get("quick") == "y"  # images are not downloaded, the same as block:images
+        self.block = _list(get("block")) or []  # resource categories the browser never downloads, see base/blocking.py
+        if self.quick and "images" not in self.block:
+            self.block.append("images")
+        self.block_hosts = _list(get("blockhosts")) or []  # extra hosts the browser never contacts
+        self.page_load = get("pageload") or "normal"  # 'normal' waits for load, 'eager' for the DOM, 'none' for nothing
+        self.nav_timeout = _float(get("navtimeout"))  # seconds a page may take to load, the driver's default without it
+        self.script_timeout = _float(get("scripttimeout"))  # seconds a script run in the page may take
+        self.link_timeout = _float(get("linktimeout"), 10.0 if get("pageload") in ("eager", "none") else None)  # seconds spent waiting for the anchors to stop changing
+        self.capture = get("capture") or "proxy"  # where statuses come from, 'proxy' (selenium-wire) or 'cdp' (Chrome only)
+        self.cookie = get("cookie")  # xpath of the cookie policy button
+        self.disclaimer = get("disclaimer")  # xpath of the disclaimer button
+
+        # Crawl
+        self.workers = _int(get("workers"), 1)
+        self.browsers = _int(get("browsers"), 1)
+        self.recycle_after = _int(get("recycleafter"))  # pages before a browser is swapped for a fresh one
+        self.max_rss = _int(get("maxrss"))  # megabytes a browser may use before it is swapped for a fresh one
+        self.nav_retries = _int(get("navretries"), 3)  # times a page that errors in the browser is loaded again
+        self.rate = _float(get("rate"))  # starting number of seconds between requests to a host
+        # most requests per second a healthy host is ramped up to, a 'rate' on its own is also the fastest the crawl goes
+        self.max_rate = _float(get("maxrate"), 1 / self.rate if self.rate and self.rate > 0 else 20.0)
+        self.max_depth = _int(get("maxdepth"))
+        self.ignore = _list(get("ignore"))  # url fragments that are never gathered
+        self.js_pages = _list(get("jspages"))  # url fragments of pages that must be rendered in the browser
+        self.fast = get("fast") == "y"  # statuses are checked over plain HTTP before rendering
+        self.store = get("store")  # sqlite file of statuses kept between runs
+        self.external = get("external") == "y"
+        self.external_workers = _int(get("externalworkers"), 10)
+        self.assets = get("assets") == "y"  # images, scripts, stylesheets and downloads are checked over HTTP
+        self.host_limit = _int(get("hostlimit"), 2)
+        self.sitemap = get("sitemap")  # y to use the sitemaps listed in robots.txt or a '|' separated list of sitemaps
+        self.robots = get("robots") == "y"
+        self.failfast = get("failfast") == "y"
+
+        # Scheduling and budgets
+        self.order = get("order") or "bfs"  # 'bfs' or 'dfs'
+        self.weights = [[part.rsplit("=", 1)[0], float(part.rsplit("=", 1)[1])] for part in get("weights").split("|")] if get("weights") else None
+        self.failure_weight = _float(get("failweight"), 0)  # brings forward urls that were broken on the previous run
+        self.max_pages = _int(get("maxpages"))  # pages crawled before the crawl stops with partial results
+        self.deadline = _float(get("deadline"))  # seconds before the crawl stops with partial results
+
+        # Url normalisation
+        self.keep_query = [] if get("keepquery") == "none" else _list(get("keepquery"))
+        self.ignore_query = _list(get("ignorequery"))
+        self.trailing_slash = get("trailingslash") or "keep"
+        self.host_aliases = dict(alias.split(">", 1) for alias in get("hostalias").split("|")) if get("hostalias") else None
+
+        # Url sets
+        self.url_set = get("urlset") or "memory"
+        self.url_set_dir = get("urlsetdir")
+        self.bloom = get("bloom") == "y"
+        self.bloom_size = _int(get("bloomsize"), 1000000)
+
+        # Checkpoints
+        self.checkpoint = get("checkpoint")
+        self.checkpoint_every = _int(get("checkpointevery"), 60)
+        self.resume = get("resume") == "y"
+
+        # Output
+        self.colors = get("colors") == "y"
+        self.screenshots = get("screenshots") != "n"
+        self.max_width = _int(get("maxwidth"))
+        self.image_format = (get("imageformat") or "png").lower()
+        if self.image_format == "jpg":  # Pillow only knows the format as jpeg
+            self.image_format = "jpeg"
+        self.report = get("report")  # '|' separated report file paths
+        self.metrics = get("metrics")  # path the json metrics summary is written to
+        self.metrics_port = _int(get("metricsport"))
+
+    def get(self, key, default=None):
+        """Returns the raw value of any argument"""
+        return self.args.get(key, default)
+
+    def validate(self):
+        """Raises if the arguments needed to launch a browser are missing"""
+        if self.browser not in ("Firefox", "Chrome"):
+            raise Exception("'browser' argument is missing or incorrect, please pass 'browser:Firefox' or 'browser:Chrome'")
+        if self.url is None:
+            raise Exception("'url' argument is missing. Example: 'url:https://www.google.com'")
+        if self.page_load not in ("normal", "eager", "none"):
+            raise Exception(f"'pageload' must be 'normal', 'eager' or 'none', not '{self.page_load}'")
+        if self.capture not in ("proxy", "cdp"):
+            raise Exception(f"'capture' must be 'proxy' or 'cdp', not '{self.capture}'")
+        if self.capture == "cdp" and self.browser != "Chrome":
+            raise Exception("'capture:cdp' reads DevTools network events and needs 'browser:Chrome'")
+        if self.image_format not in ("png", "jpeg", "webp"):
+            raise Exception(f"'imageformat' must be 'png', 'jpeg' (or 'jpg') or 'webp', not '{self.image_format}'")
+
+
+config = Config()
@@ -1,14 +1,14 @@
 """ Allows for more readable logging of key steps during execution """
 import logging
 import os
-import platform
 import time
 from datetime import datetime
-from inspect import getframeinfo, stack
 
 from colorama import Fore, Style
 
-from base.driver_setup import driver, get_arg
+from base.buffered_writer import BufferedWriter
+from base.config import config
+from base.driver_setup import get_driver
 
 
 def log_new_date_time():
@@ -28,13 +28,16 @@ class StepCounter:
     record_step_images = False
     path_root = None
 
-    def take_screenshot(self, pic_filename, fullpage=False):
+    def take_screenshot(self, pic_filename, fullpage=False, browser=None):
         """Take a screenshot of the view port
         :param pic_filename: String to be used as the image filename without the file extension
         :param fullpage: If set to True then the entire screen will saved
+        :param browser: Driver to take the screenshot with, defaults to the shared driver
         :return: void"""
+        if browser is None:
+            browser = get_driver()
 
-        save_folder = get_arg("url").split("://")[1].replace("/", "").replace('.', '-')
+        save_folder = config.url.split("://")[1].replace("/", "").replace('.', '-')
 
         if not os.path.isdir(os.path.join(StepCounter.path_root, save_folder)):
             os.mkdir(os.path.join(StepCounter.path_root, save_folder))
@@ -42,9 +45,13 @@ class StepCounter:
         full_path = os.path.join(StepCounter.path_root, save_folder, pic_filename)
 
         if not fullpage:
-            driver.save_screenshot(full_path + ".png")
+            browser.save_screenshot(full_path + ".png")
         else:
-            driver.get_full_page_screenshot_as_file(full_path + ".png")
+            browser.get_full_page_screenshot_as_file(full_path + ".png")
+
+    def steps_path(self):
+        """Returns the path of the steps file for this run"""
+        return os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt")
 
     def start(self, test_title):
         """Initiates a new set of steps by calling reset and w
@@ -53,15 +60,14 @@ class StepCounter:
         self.log_result("")
         StepCounter.test_title = test_title
         StepCounter.start_logging = True
-        with open(os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt"), "a") as f_start:
-            f_start.write(
-                f"""
+        BufferedWriter.get(self.steps_path()).write(
+            f"""
 
 {datetime.now().strftime("%d/%m/%Y %H_%M_%S")}
 Test: {test_title}
 Steps:
 """
-            )
+        )
 
     def count_step(self, text_out, sleep_secs, substep=False):
         if not StepCounter.start_logging:
@@ -70,20 +76,20 @@ Steps:
         if self.record_step_images:
             self.take_screenshot(f"{StepCounter.test_title}-{str(StepCounter.img_counter).zfill(4)}")
         if substep:
-            with open(os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt"), "a") as f_step:
-                if sleep_secs != 0:
-                    f_step.write(f"\t{text_out}; wait duration: {sleep_secs} second(s).\n")
-                else:
-                    f_step.write(f"\t{text_out}.\n")
+            if sleep_secs != 0:
+                BufferedWriter.get(self.steps_path()).write(f"\t{text_out}; wait duration: {sleep_secs} second(s).\n")
+            else:
+                BufferedWriter.get(self.steps_path()).write(f"\t{text_out}.\n")
 
         if not substep:
             StepCounter.step_no += 1
 
-            with open(os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt"), "a") as f_step:
-                if sleep_secs != 0:
-                    f_step.write(f"{str(StepCounter.step_no).zfill(2)}) {text_out}; wait duration: {sleep_secs} second(s).\n")
-                else:
-                    f_step.write(f"{str(StepCounter.step_no).zfill(2)}) {text_out}.\n")
+            if sleep_secs != 0:
+                BufferedWriter.get(self.steps_path()).write(
+                    f"{str(StepCounter.step_no).zfill(2)}) {text_out}; wait duration: {sleep_secs} second(s).\n"
+                )
+            else:
+                BufferedWriter.get(self.steps_path()).write(f"{str(StepCounter.step_no).zfill(2)}) {text_out}.\n")
 
     def reset(self, expected_result="", actual_result="", test_name="", test_passed=False):
         def reset_steps():
@@ -91,22 +97,52 @@ Steps:
             StepCounter.img_counter = 0
 
         if test_passed:
-            with open(os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt"), "a") as f_pass:
-                f_pass.write(f"PASS: {test_name}\n")
-                reset_steps()
+            BufferedWriter.get(self.steps_path()).write(f"PASS: {test_name}\n")
+            reset_steps()
         else:
-            with open(os.path.join(StepCounter.path_root, f"steps_{self.date_time}.txt"), "a") as f_fail:
-                f_fail.write(f"FAIL: {self.test_title}:\n")
-                f_fail.write(f"Expected Result:\n{expected_result}\n")
-                f_fail.write(f"\nActual Result:\n{actual_result}\n")
-                reset_steps()
-                raise Exception(f"Expected result: {expected_result}\nActual result: {actual_result}")
+            BufferedWriter.get(self.steps_path()).write(
+                f"FAIL: {self.test_title}:\nExpected Result:\n{expected_result}\n\nActual Result:\n{actual_result}\n"
+            )
+            reset_steps()
+            raise Exception(f"Expected result: {expected_result}\nActual result: {actual_result}")
 
     def log_result(self, text):
         if not StepCounter.start_logging:
             return
-        with open(os.path.join(StepCounter.path_root, f"results_{self.date_time}.txt"), "a") as file:
-            file.write(f"{text}\n")
+        BufferedWriter.get(os.path.join(StepCounter.path_root, f"results_{self.date_time}.txt")).write(f"{text}\n")
+
+
+# Level number passed to xlogging: logging level, label and console colour
+LEVELS = {
+    1: [logging.DEBUG, "Debug: ", Fore.WHITE],
+    2: [logging.INFO, "Info: ", Fore.GREEN],
+    3: [logging.WARNING, "Warn: ", Fore.YELLOW],
+    4: [logging.ERROR, "Error: ", Fore.LIGHTRED_EX],
+    5: [logging.CRITICAL, "CRITICAL: ", Fore.RED],
+}
+
+# Messages go through their own handler so the caller's file and line come from logging's cheap frame lookup,
+# the level name and time prefix match the root format set up in main.py
+logger = logging.getLogger("dead_link_checker")
+logger.propagate = False
+_handler = logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(levelname)-.4s:%(asctime)s:%(filename)-20s:%(lineno)-3d:%(message)s"))
+logger.addHandler(_handler)
+
+
+class LogLine:
+    def __init__(self, text_out, log_level, color, sleep_secs):
+        """A console message that is only formatted if a handler actually emits it"""
+        self.text_out = text_out
+        self.log_level = log_level
+        self.color = color
+        self.sleep_secs = sleep_secs
+
+    def __str__(self):
+        wait = f"; wait duration: {self.sleep_secs} second(s)" if self.sleep_secs != 0 else ""
+        if self.color:
+            return f"{self.color}{self.log_level} {self.text_out}{wait}{Style.RESET_ALL}"
+        return f"{self.log_level} {self.text_out}{wait}"
 
 
 def xlogging(set_debug_level, text_out, log_as_step="n", sleep_secs=0, frame_stack=1):
@@ -117,67 +153,16 @@ def xlogging(set_debug_level, text_out, log_as_step="n", sleep_secs=0, frame_sta
     :param sleep_secs: How long to wait before continuing with the program
     :param frame_stack: Set to true if the file calling this function == xpath_tools.py
     :return: Void"""
+    level, log_level, color = LEVELS.get(set_debug_level, [logging.INFO, "", Fore.WHITE])
 
-    caller = getframeinfo(stack()[frame_stack][0])
-
-    if platform.system() == "Windows":
-        f_name = caller.filename.split("\\")[-1]
-    else:
-        f_name = caller.filename.split("/")[-1]
-
-    if set_debug_level == 1:
-        debug_level = logging.debug
-        log_level = "Debug: "
-        color = Fore.WHITE
-    elif set_debug_level == 2:
-        debug_level = logging.info
-        log_level = "Info: "
-        color = Fore.GREEN
-    elif set_debug_level == 3:
-        debug_level = logging.warning
-        log_level = "Warn: "
-        color = Fore.YELLOW
-    elif set_debug_level == 4:
-        debug_level = logging.error
-        log_level = "Error: "
-        color = Fore.LIGHTRED_EX
-    elif set_debug_level == 5:
-        debug_level = logging.critical
-        log_level = "CRITICAL: "
-        color = Fore.RED
-    else:
-        debug_level = 2
-        log_level = ""
-        color = Fore.WHITE
-
-    if log_as_step == "n":
-        if sleep_secs != 0:
-            if get_arg("colors") == "y":
-                debug_level(
-                    f"{f_name:<20}:{caller.lineno:<3}:{color}{log_level} {text_out}; wait duration: {sleep_secs} second(s){Style.RESET_ALL}"
-                )
-            else:
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{log_level} {text_out}; wait duration: {sleep_secs} second(s)")
-        else:
-            if get_arg("colors") == "y":
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{color}{log_level} {text_out}{Style.RESET_ALL}")
-            else:
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{log_level} {text_out}")
-        time.sleep(sleep_secs)
+    if log_as_step == "y":
+        color = Fore.LIGHTBLUE_EX
+
+    if logger.isEnabledFor(level):
+        logger.log(level, LogLine(text_out, log_level, color if config.colors else None, sleep_secs), stacklevel=frame_stack + 1)
 
     if log_as_step == "y":
-        if sleep_secs != 0:
-            if get_arg("colors") == "y":
-                debug_level(
-                    f"{f_name:<20}:{caller.lineno:<3}:{Fore.LIGHTBLUE_EX}{log_level} {text_out}; wait duration: {sleep_secs} second(s){Style.RESET_ALL}"
-                )
-            else:
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{log_level} {text_out}; wait duration: {sleep_secs} second(s)")
-            StepCounter().count_step(f"{log_level}{text_out}", sleep_secs)
-        else:
-            if get_arg("colors") == "y":
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{Fore.LIGHTBLUE_EX}{log_level} {text_out}{Style.RESET_ALL}")
-            else:
-                debug_level(f"{f_name:<20}:{caller.lineno:<3}:{log_level} {text_out}")
-            StepCounter().count_step(f"{log_level}{text_out}", sleep_secs)
+        StepCounter().count_step(f"{log_level}{text_out}", sleep_secs)
+
+    if sleep_secs != 0:
         time.sleep(sleep_secs)
@@ -0,0 +1,212 @@
+""" Lends browser instances out to crawl workers so pages can be rendered in parallel """
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from base.config import config
+from base.custom_logging import xlogging
+from base.driver_setup import DriverSetup, get_driver, new_driver
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, without it browsers are only recycled by page count
+    psutil = None
+
+LAUNCH_ATTEMPTS = 3  # times launching a browser is tried before giving up, waiting longer after each failure
+RSS_CHECK_EVERY = 10  # pages between memory checks, walking the browser's process tree is not free
+
+
+def browser_rss_mb(browser):
+    """Adds up the resident memory of the driver process and every browser process it started
+    :return: Megabytes, or None if the memory cannot be read"""
+    if psutil is None:
+        return None
+    try:
+        process = psutil.Process(browser.service.process.pid)
+        return sum(p.memory_info().rss for p in [process] + process.children(recursive=True)) / (1024 * 1024)
+    except (psutil.Error, AttributeError):
+        return None
+
+
+class DriverPool:
+    def __init__(self, size=1, max_pages=None, max_rss_mb=None, on_recycle=None):
+        """DriverPool:
+        Use: .borrow as a context manager to get a healthy driver for the duration of the block
+        Use: .close to quit the browsers launched by the pool
+        :param size: Maximum number of browsers, extra browsers are only launched when every other one is busy
+        :param max_pages: Browsers are swapped for a fresh one after lending this many pages
+        :param max_rss_mb: Browsers are swapped for a fresh one once they use more than this many megabytes, needs psutil
+        :param on_recycle: Called with the old and the new browser once a recycled browser's cookies are restored"""
+        self.size = max(size, 1)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.on_recycle = on_recycle
+        self.idle = queue.LifoQueue()  # LIFO keeps the warmest browsers busy
+        self.launched = []  # browsers started by the pool, the shared driver from driver_setup is not one of them
+        self.pages = {}  # pages lent out by each browser since it was launched
+        self.lock = threading.Lock()
+
+        self.count = 0  # slots in use, each one is a browser that is idle or lent out
+        self.shared = False  # true while the shared driver from driver_setup holds one of the slots
+
+        if max_rss_mb and psutil is None:
+            xlogging(3, "psutil is not installed, browsers will not be recycled by memory use")
+
+    def _acquire(self):
+        """Gets an idle browser, launches a new one if the pool has room or waits for one to be returned"""
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self.lock:
+                launch = self.count < self.size
+                if launch:
+                    self.count += 1
+                    number = self.count
+                    shared = not self.shared
+                    self.shared = True
+            if launch:
+                xlogging(2, f"Launching browser {number} of {self.size}")
+                try:
+                    if shared:  # Modules such as xpath_tools default to the shared driver, so it is lent out first
+                        return get_driver()
+                    browser = self.launch()
+                except WebDriverException:
+                    with self.lock:
+                        self.count -= 1
+                        self.shared = self.shared and not shared
+                    raise
+                self.launched.append(browser)
+                return browser
+
+            try:
+                return self.idle.get(timeout=1)  # Wakes up now and then in case a slot was given up
+            except queue.Empty:
+                continue
+
+    def launch(self):
+        """Launches a browser, backing off between failed attempts
+        :return: The new driver"""
+        for attempt in range(LAUNCH_ATTEMPTS):
+            try:
+                return new_driver()
+            except WebDriverException as e:
+                if attempt == LAUNCH_ATTEMPTS - 1:
+                    raise
+                xlogging(4, f"Unable to launch a browser, trying again in {5 * 2 ** attempt} seconds: {e.msg}")
+                time.sleep(5 * 2 ** attempt)
+
+    def healthy(self, browser):
+        """Checks the session still responds
+        :return: True/False"""
+        try:
+            browser.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def _release(self, browser):
+        """Gives up the slot of a browser that could not be replaced, so a later borrow launches a new one"""
+        if browser in self.launched:
+            self.launched.remove(browser)
+        with self.lock:
+            self.count -= 1
+            if DriverSetup._instance is not None and DriverSetup._instance.driver is browser:
+                DriverSetup._instance.set_driver(None)  # get_driver launches a new shared driver when next asked
+                self.shared = False
+
+    def replace(self, browser):
+        """Quits a browser and launches a new one in its place, if that fails the browser's slot is given up and the
+        WebDriverException is raised
+        :return: The new driver"""
+        try:
+            browser.quit()
+        except WebDriverException:
+            pass
+        self.pages.pop(browser, None)
+        try:
+            new = self.launch()
+        except WebDriverException:
+            xlogging(4, "Unable to launch a replacement browser, giving up its place in the pool")
+            self._release(browser)
+            raise
+        if browser in self.launched:
+            self.launched.remove(browser)
+        if DriverSetup._instance is not None and DriverSetup._instance.driver is browser:
+            DriverSetup._instance.set_driver(new)  # Keep the shared driver usable for the modules that default to it
+        else:
+            self.launched.append(new)
+        return new
+
+    def worn_out(self, browser):
+        """Checks the browser against the page and memory limits
+        :return: True/False"""
+        pages = self.pages.get(browser, 0)
+        if self.max_pages and pages >= self.max_pages:
+            xlogging(2, f"Recycling browser after {pages} page(s)")
+            return True
+        if self.max_rss_mb and pages % RSS_CHECK_EVERY == 0:
+            rss = browser_rss_mb(browser)
+            if rss is not None and rss > self.max_rss_mb:
+                xlogging(2, f"Recycling browser using {rss:.0f} MB after {pages} page(s)")
+                return True
+        return False
+
+    def recycle(self, browser):
+        """Swaps a browser for a fresh one carrying the same cookies, the basic auth is redone by new_driver
+        :return: The new driver"""
+        try:
+            cookies = browser.get_cookies()
+        except WebDriverException:
+            cookies = []
+        new = self.replace(browser)
+        if not cookies:
+            return new
+        try:
+            new.get(config.url)  # Cookies can only be set for the site being shown
+            for cookie in cookies:
+                new.add_cookie(cookie)
+        except WebDriverException:
+            xlogging(3, "Unable to restore the cookies of a recycled browser")
+            return new
+        if self.on_recycle is not None:
+            self.on_recycle(browser, new)
+        return new
+
+    @contextmanager
+    def borrow(self, fresh=False):
+        """Lends a health checked browser to the caller and takes it back afterwards, crashed browsers are replaced
+        when they are next borrowed and worn out ones are recycled as they are returned
+        :param fresh: If set to True then the browser is recycled before it is lent, e.g. to retry a page that failed"""
+        browser = self._acquire()
+        if fresh:
+            browser = self.recycle(browser)
+        elif not self.healthy(browser):
+            xlogging(3, "Browser session is not responding, replacing it")
+            browser = self.replace(browser)
+        try:
+            yield browser
+        finally:
+            self.pages[browser] = self.pages.get(browser, 0) + 1
+            returned = True
+            if self.worn_out(browser):
+                try:
+                    browser = self.recycle(browser)
+                except WebDriverException:
+                    returned = False  # The slot was given up by replace
+            if returned:
+                self.idle.put(browser)
+
+    def close(self):
+        """Quits every browser launched by the pool"""
+        for browser in self.launched:
+            try:
+                browser.quit()
+            except WebDriverException:
+                pass
+        self.launched = []
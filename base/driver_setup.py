@@ -1,24 +1,77 @@
 import platform
-import sys
 
+from selenium import webdriver as plain_webdriver
 from seleniumwire import webdriver
 from selenium.webdriver.chrome.service import Service
 
+from base.blocking import BlockingProfile
+from base.config import config
+from base.network_capture import CdpStatusIndex, StatusIndex
 from drivers import relpath
 
 
-def get_arg(key):
-    for i in sys.argv:
-        if i.split(":", maxsplit=1)[0] == key:
-            return i.split(":", maxsplit=1)[1]
-    return None
+def browser_options():
+    """Builds the browser options from the runtime arguments
+    :return: Chrome or Firefox options"""
+    if config.browser == "Firefox":
+        from selenium.webdriver.firefox.options import Options
+    else:
+        from selenium.webdriver.chrome.options import Options
 
+    options = Options()
+    options.headless = config.headless
+    options.page_load_strategy = config.page_load  # only anchors are needed, eager and none skip waiting for load
 
-if get_arg("browser") is None or (get_arg("browser") != "Firefox" and get_arg("browser") != "Chrome"):
-    raise Exception("'browser' argument is missing or incorrect, please pass 'browser:Firefox' or 'browser:Chrome'")
+    if config.browser == "Chrome":
+        options.add_argument("--window-size=1920,1080")
 
-if get_arg("url") is None:
-    raise Exception("'url' argument is missing. Example: 'url:https://www.google.com'")
+    if config.capture == "cdp":  # DevTools network events are written to the performance log for the CdpStatusIndex
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+    if config.browser == "Firefox":
+        options.add_argument("--width=1920")
+        options.add_argument("--height=1080")
+    return options
+
+
+# Statuses come from the StatusIndex, so only a handful of captured requests are ever kept in memory
+seleniumwire_options = {"request_storage": "memory", "request_storage_max_size": 100}
+
+
+def new_driver():
+    """Launches a browser using the runtime arguments, performs basic auth and installs the request interceptors
+    :return: The driver"""
+    config.validate()
+    options = browser_options()
+    service = Service(relpath.get_full_driver_path(config.browser, platform.system()))
+    if config.capture == "cdp":  # No proxy, statuses come from DevTools
+        new = plain_webdriver.Chrome(options=options, service=service)
+    else:
+        new = getattr(webdriver, config.browser)(options=options, service=service, seleniumwire_options=seleniumwire_options)
+
+    if not options.headless:
+        new.maximize_window()
+
+    if config.nav_timeout is not None:
+        new.set_page_load_timeout(config.nav_timeout)
+    if config.script_timeout is not None:
+        new.set_script_timeout(config.script_timeout)
+
+    if config.user and config.password is not None:
+        split_url = config.url.split("://")
+        auth_url = f"{split_url[0]}{'://'}{config.user}:{config.password}@{split_url[1]}"
+        new.get(auth_url)
+
+    if config.capture == "cdp":
+        CdpStatusIndex().attach(new)
+    else:
+        new.scopes = f".*{config.url.split('://')[1].replace('/', '')}.*"
+        StatusIndex().attach(new)  # Statuses are looked up by url instead of scanning the captured requests
+
+    BlockingProfile(config.block, config.block_hosts).apply(new, config.browser)
+
+    return new
 
 
 class DriverSetup(object):
@@ -33,12 +86,8 @@ class DriverSetup(object):
         return cls._instance
 
     def __init__(self):
-        if get_arg("browser") == "Firefox" or get_arg("browser") == "Chrome":
-            self.driver = getattr(webdriver, get_arg("browser"))(
-                options=options, service=Service(relpath.get_full_driver_path(get_arg("browser"), platform.system()))
-            )
-        else:
-            raise SystemExit("Argument required in position 2: browser:'Chrome' or 'Firefox'")
+        if self.driver is None:
+            self.driver = new_driver()
 
     def get_driver(self):
         return self.driver
@@ -47,42 +96,13 @@ class DriverSetup(object):
         self.driver = new_driver
 
 
-if get_arg("browser") == "Firefox":
-    from selenium.webdriver.firefox.options import Options
-elif get_arg("browser") == "Chrome":
-    from selenium.webdriver.chrome.options import Options
-
-options = Options()
-
-if get_arg("headless") == "n":
-    options.headless = False
-else:
-    options.headless = True
-
-if get_arg("browser") == "Chrome":
-    options.add_argument("--window-size=1920,1080")
-
-if get_arg("browser") == "Firefox":
-    options.add_argument("--width=1920")
-    options.add_argument("--height=1080")
-
-driver = DriverSetup().get_driver()
-if not options.headless:
-    driver.maximize_window()
-
-if get_arg("user") and get_arg("pass") is not None:
-    url = get_arg("url")
-    split_url = url.split("://")
-    auth_url = f"{split_url[0]}{'://'}{get_arg('user')}:{get_arg('pass')}@{split_url[1]}"
-    driver.get(auth_url)
-
-
-def interceptor(request):
-    if request.path.endswith((".png", ".jpg", ".gif", ".webp", ".svg", ".jpeg")):
-        request.abort()
-
+def get_driver():
+    """Returns the shared driver, launching it on first use so importing a module never starts a browser"""
+    return DriverSetup().get_driver()
 
-driver.scopes = f".*{get_arg('url').split('://')[1].replace('/', '')}.*"
 
-if get_arg("quick") == "y":
-    driver.request_interceptor = interceptor
+def quit_driver():
+    """Quits the shared driver if it was ever launched"""
+    if DriverSetup._instance is not None and DriverSetup._instance.driver is not None:
+        DriverSetup._instance.driver.quit()
+        DriverSetup._instance.driver = None
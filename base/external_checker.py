@@ -0,0 +1,119 @@
+""" Verifies off-domain links and page assets over HTTP in a pipeline stage of their own, alongside the internal crawl """
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from base.custom_logging import xlogging
+from base.http_checker import HttpChecker
+from base.metrics import metrics
+from base.url_sets import new_url_set
+
+
+class ExternalChecker:
+    def __init__(self, workers=10, host_limit=2, rate_limiter=None, on_broken=None, name="external", auth_host=None):
+        """ExternalChecker:
+        Use: .submit to queue an external url, each unique url is only checked once
+        Use: .results to wait for the outstanding checks and get the broken links
+        Use: .close once the checks are no longer needed to release the url set
+        :param workers: Number of external urls checked concurrently across all hosts
+        :param host_limit: Maximum connections and concurrent checks against any single host
+        :param rate_limiter: HostRateLimiter shared with the internal crawl
+        :param on_broken: Called with [response code, url, referrer] as soon as a broken or unreachable url is found
+        :param name: What is being checked, used in the log, the metrics and the name of the url set
+        :param auth_host: Host that is sent the basic auth credentials, no other host ever gets them"""
+        self.on_broken = on_broken
+        self.name = name
+        self.auth_host = auth_host
+        self.http_checker = HttpChecker(maxsize=host_limit, block=True, auth=False, rate_limiter=rate_limiter)  # credentials stay on our own domain
+        if auth_host is not None:
+            self.auth_checker = HttpChecker(maxsize=host_limit, block=True, rate_limiter=rate_limiter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.host_slots = defaultdict(lambda: threading.BoundedSemaphore(host_limit))  # per host concurrency caps
+        self.lock = threading.Lock()
+
+        self.checked = new_url_set(f"{name}_checked")  # unique urls that have been queued
+        self.pending = {}  # future of each check that has not finished to the [url, referrer] being checked
+        self.broken = []  # [response code, url, referrer] of each broken or unreachable url
+        self.finished = 0  # number of checks that have finished
+
+    def submit(self, url, referrer):
+        """Queues a url to be checked without waiting for the result
+        :param url: Absolute external url
+        :param referrer: Page the url was found on"""
+        if not self.checked.add_if_new(url):
+            return
+        with self.lock:
+            future = self.executor.submit(self._check, url, referrer)
+            self.pending[future] = [url, referrer]
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        """Moves a finished check out of the pending ones, only the broken urls are kept. Cancelled checks stay pending
+        so they are saved as outstanding"""
+        if future.cancelled():
+            return
+        with self.lock:
+            url, referrer = self.pending.pop(future)
+            self.finished += 1
+        if future.exception() is not None:
+            xlogging(4, f"Checking {self.name} link: {url} FROM: {referrer} failed: {future.exception()}")
+            result = [None, url, referrer]
+        else:
+            result = future.result()
+        status = result[0]
+        if status is None or str(status)[0] == "4" or str(status)[0] == "5":
+            with self.lock:
+                self.broken.append(result)
+
+    def _check(self, url, referrer):
+        """Checks a single url while holding one of its host's slots
+        :return: [response code, url, referrer]"""
+        host = urlparse(url).netloc
+        with self.lock:
+            slot = self.host_slots[host]
+        http_checker = self.auth_checker if host == self.auth_host else self.http_checker
+        with slot, metrics.stage(f"{self.name}_check"):
+            status = http_checker.check(url)[0]
+        metrics.count(f"{self.name}_checked")
+
+        if status is None:
+            xlogging(4, f"UNABLE TO VISIT {self.name} link: {url} FROM: {referrer}")
+        elif str(status)[0] == "4" or str(status)[0] == "5":
+            xlogging(2, f"Response '{status}' for {self.name} url:{url} from referer: {referrer}")
+        else:
+            return [status, url, referrer]
+
+        if self.on_broken is not None:
+            self.on_broken([status, url, referrer])
+        return [status, url, referrer]
+
+    def results(self, cancel=False):
+        """Waits for every queued check to finish
+        :param cancel: If set to True then checks that have not started yet are dropped and left outstanding
+        :return: list of lists containing response code, url and referrer for each broken or unreachable url"""
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+        with self.lock:
+            return list(self.broken)
+
+    def snapshot(self):
+        """Gets the progress of the external checks without waiting for them
+        :return: Dictionary of the broken links found so far, the checked urls as dumped by their url set and the
+        [url, referrer] of each check still outstanding"""
+        with self.lock:
+            broken = list(self.broken)
+            outstanding = list(self.pending.values())
+        checked = self.checked.dump(exclude=[url for url, referrer in outstanding])
+        return {"broken": broken, "checked": checked, "outstanding": outstanding}
+
+    def restore(self, snapshot):
+        """Carries on from a snapshot taken by a previous run, checked urls are not checked again
+        :param snapshot: Dictionary returned by .snapshot"""
+        self.checked.load(snapshot["checked"])
+        self.broken.extend(snapshot["broken"])
+        for url, referrer in snapshot["outstanding"]:
+            self.submit(url, referrer)
+
+    def close(self):
+        """Releases the url set of checked urls, e.g. deletes its file when it is kept on disk"""
+        self.checked.close()
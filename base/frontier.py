@@ -0,0 +1,56 @@
+""" Orders the pages waiting to be crawled so the most valuable ones are checked first """
+import heapq
+import itertools
+
+
+class Frontier:
+    def __init__(self, order="bfs", weights=None, failure_weight=0, url_store=None):
+        """Frontier:
+        Use: .push to queue a [url, referrer, depth] entry and .pop to take the entry with the lowest priority
+        Use: iterate over it to get the queued entries in the order they would be popped, e.g. for checkpoints
+        :param order: 'bfs' crawls the site level by level, 'dfs' follows one branch to the bottom before the next
+        :param weights: List of [url fragment, weight], the weight of every fragment found in a url is added to its
+        priority, so negative weights bring pages forward and positive weights push them back
+        :param failure_weight: Subtracted from the priority of urls that were broken on a previous run
+        :param url_store: UrlStore holding the previous run's statuses, failure history is ignored without one"""
+        if order not in ("bfs", "dfs"):
+            raise Exception(f"'order' must be 'bfs' or 'dfs', not '{order}'")
+        self.direction = 1 if order == "bfs" else -1  # depth counts for or against a page
+        self.weights = weights or []
+        self.failure_weight = failure_weight
+        self.url_store = url_store if failure_weight else None
+        self.heap = []
+        self.counter = itertools.count()  # ties go first in first out for bfs and last in first out for dfs
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        return iter([entry for _, _, entry in sorted(self.heap)])
+
+    def priority(self, url, depth):
+        """Works out when a url should be crawled, lower goes first"""
+        priority = self.direction * depth
+        for fragment, weight in self.weights:
+            if fragment in url:
+                priority += weight
+        if self.url_store is not None:
+            previous = self.url_store.get(url)
+            if previous is not None and (previous[0] is None or previous[0] >= 400):
+                priority -= self.failure_weight
+        return priority
+
+    def push(self, entry):
+        """Queues a [url, referrer, depth] entry"""
+        url, parent_url, depth = entry
+        heapq.heappush(self.heap, (self.priority(url, depth), self.direction * next(self.counter), entry))
+
+    def extend(self, entries):
+        """Queues every entry"""
+        for entry in entries:
+            self.push(entry)
+
+    def pop(self):
+        """Takes the entry that should be crawled next
+        :return: [url, referrer, depth]"""
+        return heapq.heappop(self.heap)[2]
@@ -0,0 +1,122 @@
+""" Browserless HTTP status checks using a pooled keep-alive client """
+import hashlib
+import time
+
+import urllib3
+from urllib3.exceptions import HTTPError
+
+from base.config import config
+from base.metrics import metrics
+
+
+class HttpChecker:
+    def __init__(self, maxsize=10, timeout=15, block=False, auth=True, rate_limiter=None):
+        """HttpChecker:
+        Use: .check to get the status code and content type of a url without rendering it
+        :param maxsize: Number of keep-alive connections kept open per host
+        :param timeout: Connect and read timeout in seconds
+        :param block: If set to True then maxsize is a hard cap and requests wait for a free connection to the host
+        :param auth: If set to False then the basic auth credentials from the runtime arguments are never sent
+        :param rate_limiter: HostRateLimiter shared with the other workers, requests are not limited without one"""
+        self.rate_limiter = rate_limiter
+
+        headers = urllib3.make_headers(keep_alive=True, user_agent="Dead-Link-Checker")
+        if auth and config.user and config.password is not None:
+            headers.update(urllib3.make_headers(basic_auth=f"{config.user}:{config.password}"))
+
+        self.pool = urllib3.PoolManager(
+            num_pools=50,
+            maxsize=maxsize,
+            block=block,
+            headers=headers,
+            timeout=urllib3.Timeout(connect=timeout, read=timeout),
+            retries=urllib3.Retry(total=2, redirect=5, raise_on_redirect=False, raise_on_status=False),
+        )
+
+    def _request(self, method, url, headers=None, read_chunk=None, attempts=3, drain=True):
+        """Sends a request through the rate limiter and hands the connection back to the pool, requests the host
+        throttles with a 429 or 503 are sent again once the host's back off period has passed
+        :param headers: Replaces the default headers
+        :param read_chunk: Called with each chunk of a 200 response's body, otherwise the body is drained unread
+        :param attempts: Number of times a throttled request is sent before its status is returned
+        :param drain: If set to False then an unread body is dropped by closing the connection instead of being read
+        :return: The response with its body consumed"""
+        for attempt in range(attempts):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+            started = time.perf_counter()
+
+            response = self.pool.request(method, url, headers=headers, preload_content=False)
+            if read_chunk is not None and response.status == 200:
+                for chunk in response.stream(65536):
+                    read_chunk(chunk)
+            elif drain:
+                response.drain_conn()
+            else:
+                response.close()
+            response.release_conn()
+
+            if self.rate_limiter is None:
+                return response
+            self.rate_limiter.feedback(url, response.status, time.perf_counter() - started, response.headers.get("Retry-After"))
+            if not self.rate_limiter.throttled(response.status):
+                return response
+            metrics.count("retries")
+        return response
+
+    def open(self, url):
+        """Sends a GET through the rate limiter without reading the body, so large files can be streamed
+        :param url: Absolute url to open
+        :return: The response, the caller must call release_conn once done, or None if the url could not be reached"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+        started = time.perf_counter()
+        try:
+            response = self.pool.request("GET", url, preload_content=False)
+        except HTTPError:
+            return None
+        if self.rate_limiter is not None:
+            self.rate_limiter.feedback(url, response.status, time.perf_counter() - started, response.headers.get("Retry-After"))
+        return response
+
+    def check(self, url):
+        """Sends a HEAD request and falls back to GET when the server refuses or fails the HEAD, the GET only asks for
+        the first byte and the connection is closed rather than reading a body the server sends anyway
+        :param url: Absolute url to check
+        :return: [status code, content type], or [None, None] if the url could not be reached"""
+        try:
+            response = self._request("HEAD", url)
+            if response.status >= 400:  # Plenty of servers mishandle HEAD, confirm with a GET before reporting
+                response = self._request("GET", url, dict(self.pool.headers, Range="bytes=0-0"), drain=False)
+                if response.status == 416:  # An empty file has no first byte to send
+                    response = self._request("GET", url, drain=False)
+        except HTTPError:
+            return [None, None]
+        status = 200 if response.status == 206 else response.status  # The range was served so the url is fine
+        return [status, response.headers.get("Content-Type", "")]
+
+    def fetch(self, url, etag=None, last_modified=None):
+        """Sends a conditional GET and hashes the body, so unchanged pages can be recognised without rendering them
+        :param url: Absolute url to fetch
+        :param etag: ETag recorded on a previous check, sent as If-None-Match
+        :param last_modified: Last-Modified recorded on a previous check, sent as If-Modified-Since
+        :return: [status code, content type, etag, last modified, content hash], all None if the url could not be reached"""
+        headers = dict(self.pool.headers)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        content_hash = hashlib.sha1()
+        try:
+            response = self._request("GET", url, headers, content_hash.update)
+        except HTTPError:
+            return [None, None, None, None, None]
+
+        return [
+            response.status,
+            response.headers.get("Content-Type", ""),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            content_hash.hexdigest() if response.status == 200 else None,
+        ]
@@ -0,0 +1,134 @@
+""" Per stage timings and crawl counters, exported as Prometheus text or a JSON summary """
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]  # upper bounds in seconds
+PREFIX = "dead_link_checker"
+
+
+class Histogram:
+    def __init__(self):
+        """Cumulative bucket counts of observed durations, as Prometheus histograms use"""
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, secs):
+        for index, bound in enumerate(BUCKETS):
+            if secs <= bound:
+                self.buckets[index] += 1
+        self.count += 1
+        self.sum += secs
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in
+        :return: Seconds, or None if nothing has been observed"""
+        if self.count == 0:
+            return None
+        for index, bound in enumerate(BUCKETS):
+            if self.buckets[index] >= q * self.count:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        """Metrics:
+        Use: .stage as a context manager to time a stage of processing a page
+        Use: .count to increase a counter
+        Use: .prometheus or .summary to export them"""
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block and records it against the stage, whether or not it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def observe(self, name, secs):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(secs)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def prometheus(self):
+        """Renders every metric in the Prometheus text exposition format
+        :return: String"""
+        lines = [f"# TYPE {PREFIX}_stage_seconds histogram"]
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, bucket_count in zip(BUCKETS, histogram.buckets):
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {bucket_count}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {histogram.sum:.6f}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                lines.append(f"{PREFIX}_{name}_total {value}")
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.monotonic() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Summarises every metric
+        :return: JSON serialisable dictionary"""
+        with self.lock:
+            stages = {
+                name: {
+                    "count": histogram.count,
+                    "total_secs": round(histogram.sum, 3),
+                    "mean_secs": round(histogram.sum / histogram.count, 4) if histogram.count else None,
+                    "p50_secs": histogram.quantile(0.5),
+                    "p95_secs": histogram.quantile(0.95),
+                }
+                for name, histogram in sorted(self.histograms.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {"elapsed_secs": round(time.monotonic() - self.started, 3), "stages": stages, "counters": counters}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def serve(self, port):
+        """Serves /metrics as Prometheus text and /metrics.json as the summary on a background thread
+        :param port: Port to listen on"""
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = owner.prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(owner.summary()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Scrapes are not worth a console line each
+
+        server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+
+metrics = Metrics()
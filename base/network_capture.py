@@ -0,0 +1,113 @@
+""" Indexes main document responses by url as the browser receives them """
+import json
+import threading
+from collections import OrderedDict
+
+from selenium.common.exceptions import WebDriverException
+
+# Url and response code of the last navigation, responseStatus is only reported by Chrome 109 and later
+NAVIGATION_STATUS_SCRIPT = """
+const entry = performance.getEntriesByType("navigation")[0];
+return entry ? [entry.name, entry.responseStatus || null] : null;
+"""
+
+
+class StatusIndex:
+    def __init__(self, size=500):
+        """StatusIndex:
+        Use: .attach to start indexing a selenium-wire driver's responses
+        Use: .status to look up the response code of a page the driver has navigated to
+        :param size: Maximum number of statuses kept, the oldest are dropped first so memory stays flat"""
+        self.size = size
+        self.statuses = OrderedDict()
+        self.lock = threading.Lock()
+        self.browser = None
+
+    def attach(self, browser):
+        """Installs the response interceptor and makes the index available as browser.status_index"""
+        browser.response_interceptor = self.response_interceptor
+        browser.status_index = self
+        self.browser = browser
+
+    def response_interceptor(self, request, response):
+        """Called by selenium-wire for every response, only main documents are kept"""
+        if request.headers.get("Sec-Fetch-Dest", "document") != "document":
+            return
+        if "text/html" not in request.headers.get("Accept", "text/html"):
+            return
+        self._store(request.url, response.status_code)
+
+    def _store(self, url, status):
+        """Indexes a document response, the first response is kept as a redirect chain reuses the url"""
+        with self.lock:
+            if url in self.statuses:
+                return
+            self.statuses[url] = status
+            if len(self.statuses) > self.size:
+                self.statuses.popitem(last=False)
+
+    def peek(self, url):
+        """Gets the response code for a url without forgetting it
+        :return: The response code, or None if no document response was captured for the url"""
+        with self.lock:
+            return self.statuses.get(url)
+
+    def status(self, url):
+        """Gets and forgets the response code for a url
+        :return: The response code, or None if no document response was captured for the url"""
+        with self.lock:
+            return self.statuses.pop(url, None)
+
+    def clear(self):
+        """Drops whatever the browser captured to produce the statuses that have already been indexed"""
+        del self.browser.requests
+
+
+class CdpStatusIndex(StatusIndex):
+    """StatusIndex for Chrome without the selenium-wire proxy, statuses are read from the DevTools network events in
+    the performance log, falling back to the Navigation Timing API when the log has no event for the url"""
+
+    def attach(self, browser):
+        """Makes the index available as browser.status_index, the driver must be started with the performance log on"""
+        browser.status_index = self
+        self.browser = browser
+
+    def _drain(self):
+        """Indexes the document responses in the performance log, reading the log empties it"""
+        try:
+            entries = self.browser.get_log("performance")
+        except WebDriverException:
+            return
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            if params.get("type") != "Document":
+                continue
+            if message["method"] == "Network.requestWillBeSent" and "redirectResponse" in params:
+                self._store(params["redirectResponse"]["url"], params["redirectResponse"]["status"])
+            elif message["method"] == "Network.responseReceived":
+                self._store(params["response"]["url"], params["response"]["status"])
+
+    def _navigation_status(self, url):
+        """Gets the status of the page the browser is showing from the Navigation Timing API"""
+        try:
+            navigation = self.browser.execute_script(NAVIGATION_STATUS_SCRIPT)
+        except WebDriverException:
+            return None
+        if navigation is None or navigation[0] != url:
+            return None
+        return navigation[1]
+
+    def peek(self, url):
+        self._drain()
+        status = super().peek(url)
+        return status if status is not None else self._navigation_status(url)
+
+    def status(self, url):
+        self._drain()
+        status = super().status(url)
+        return status if status is not None else self._navigation_status(url)
+
+    def clear(self):
+        """Drops the performance log entries that have not been read"""
+        self._drain()
@@ -0,0 +1,109 @@
+""" Token bucket rate limiting per host that adapts to latency, errors and server backpressure """
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+def retry_after_seconds(value):
+    """Parses a Retry-After header, which is either a number of seconds or a HTTP date
+    :return: Seconds to wait, or None if the header is missing or invalid"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostBucket:
+    def __init__(self, rate):
+        """State of a single host, all access goes through HostRateLimiter's lock
+        :param rate: Starting requests per second"""
+        self.rate = rate
+        self.tokens = 1.0
+        self.refilled = time.monotonic()
+        self.blocked_until = 0.0  # set when the host asks us to back off
+        self.baseline_latency = None  # fastest response seen, used to spot the host slowing down
+        self.throttled = 0  # consecutive 429/503 responses
+
+
+class HostRateLimiter:
+    def __init__(self, rate=None, max_rate=20.0, min_rate=0.05, max_backoff=300):
+        """HostRateLimiter:
+        One token bucket per host, shared by every worker
+        Use: .acquire before each request to wait for the host's next free slot
+        Use: .feedback after each request so the host's rate can adapt
+        :param rate: Starting requests per second for each host, defaults to max_rate
+        :param max_rate: Highest requests per second a host is ramped up to
+        :param min_rate: Lowest requests per second a host is slowed down to
+        :param max_backoff: Longest wait in seconds after a 429 or 503 without a Retry-After header"""
+        self.start_rate = min(rate, max_rate) if rate else max_rate
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, self.start_rate)
+        self.max_backoff = max_backoff
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, url):
+        """Gets the bucket of a url's host, the caller must hold the lock"""
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = HostBucket(self.start_rate)
+        return self.buckets[host]
+
+    def acquire(self, url):
+        """Waits until the url's host has a token free, or its back off period has passed"""
+        while True:
+            with self.lock:
+                bucket = self._bucket(url)
+                now = time.monotonic()
+                bucket.tokens = min(bucket.tokens + (now - bucket.refilled) * bucket.rate, 1.0)
+                bucket.refilled = now
+                if now < bucket.blocked_until:
+                    wait_secs = bucket.blocked_until - now
+                elif bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                else:
+                    wait_secs = (1 - bucket.tokens) / bucket.rate
+            time.sleep(wait_secs)
+
+    def feedback(self, url, status=None, latency=None, retry_after=None):
+        """Adapts the host's rate, additive increase while it is healthy, multiplicative decrease when it slows down
+        or errors, and a full stop when it asks us to back off
+        :param status: Response code, None if unknown
+        :param latency: Seconds the request took, None if unknown
+        :param retry_after: Value of the Retry-After header, if any"""
+        with self.lock:
+            bucket = self._bucket(url)
+
+            if status in (429, 503):
+                bucket.throttled += 1
+                wait_secs = retry_after_seconds(retry_after)
+                if wait_secs is None:
+                    wait_secs = min(2 ** bucket.throttled, self.max_backoff)
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + wait_secs)
+                bucket.rate = max(bucket.rate / 2, self.min_rate)
+                return
+            bucket.throttled = 0
+
+            slow = False
+            if latency is not None:
+                if bucket.baseline_latency is None or latency < bucket.baseline_latency:
+                    bucket.baseline_latency = latency
+                slow = latency > 3 * bucket.baseline_latency + 0.1
+
+            if slow or (status is not None and status >= 500):
+                bucket.rate = max(bucket.rate * 0.75, self.min_rate)
+            elif status is not None or latency is not None:
+                bucket.rate = min(bucket.rate + 0.1, self.max_rate)
+
+    def throttled(self, status):
+        """Returns true if a response code means the host wants us to slow down"""
+        return status in (429, 503)
@@ -0,0 +1,81 @@
+""" Streams results to report files as they are found, every record is flushed so the files can be tailed live """
+import csv
+import json
+import os
+from datetime import datetime
+from xml.sax.saxutils import quoteattr
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        """JsonlWriter:
+        One JSON object per line
+        :param path: Location of the report file"""
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, status, url, referrer, image=None):
+        self.file.write(
+            json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "status": status, "url": url, "referrer": referrer, "image": image})
+            + "\n"
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    def __init__(self, path):
+        """CsvWriter:
+        One row per result after a header row
+        :param path: Location of the report file"""
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["time", "status", "url", "referrer", "image"])
+        self.file.flush()
+
+    def write(self, status, url, referrer, image=None):
+        self.writer.writerow([datetime.now().isoformat(timespec="seconds"), status, url, referrer, image])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JUnitWriter:
+    def __init__(self, path):
+        """JUnitWriter:
+        One failed test case per broken link, the closing tags are written by .close
+        :param path: Location of the report file"""
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n<testsuite name="Dead-Link-Checker">\n')
+        self.file.flush()
+
+    def write(self, status, url, referrer, image=None):
+        message = f"Response {status}" if status is not None else "Unable to visit"
+        details = f"Referrer: {referrer}" + (f"\nImage: {image}" if image else "")
+        self.file.write(
+            f"<testcase classname={quoteattr(referrer or '')} name={quoteattr(url)}>"
+            f"<failure message={quoteattr(message)}>{details.replace('&', '&amp;').replace('<', '&lt;')}</failure></testcase>\n"
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.write("</testsuite>\n</testsuites>\n")
+        self.file.close()
+
+
+WRITERS = {".jsonl": JsonlWriter, ".csv": CsvWriter, ".xml": JUnitWriter}
+
+
+def new_report_writers(paths):
+    """Creates a writer for each path, the format is chosen by the file extension (.jsonl, .csv or .xml for JUnit)
+    :param paths: '|' separated list of report file paths, as passed in the runtime argument 'report'
+    :return: List of writers"""
+    writers = []
+    for path in paths.split("|"):
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in WRITERS:
+            raise Exception(f"Unknown report format '{path}', use a .jsonl, .csv or .xml (JUnit) file")
+        writers.append(WRITERS[extension](path))
+    return writers
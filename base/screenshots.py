@@ -0,0 +1,143 @@
+""" Captures screenshots of broken links only and writes them to disk on a background thread """
+import io
+import os
+import queue
+import re
+import threading
+from hashlib import blake2b
+
+from base.custom_logging import StepCounter, xlogging
+from base.config import config
+from base.metrics import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, without it screenshots are written as captured
+    Image = None
+
+# Gets the resolved href of every anchor, so they can be normalised the same way the crawl normalised the broken url
+ANCHOR_HREFS_SCRIPT = """
+return Array.from(document.querySelectorAll("a[href]"), (a) => a.href);
+"""
+
+# Highlights every anchor whose resolved href is in arguments[0] and scrolls the first one into view
+HIGHLIGHT_LINK_SCRIPT = """
+const targets = new Set(arguments[0]);
+let first = null;
+for (const a of document.querySelectorAll("a[href]")) {
+    if (targets.has(a.href)) {
+        a.style.border = "3px solid red";
+        if (first === null) { first = a; }
+    }
+}
+if (first !== null) { first.scrollIntoView({block: "center"}); }
+return first !== null;
+"""
+
+
+def error_image_path(url):
+    """Gets where the screenshot for a broken url is saved
+    :param url: The broken url
+    :return: Path of the image file"""
+    save_folder = config.url.split("://")[1].replace("/", "").replace('.', '-') + "__error_pages"
+    # Query strings bring characters such as ? & : that Windows cannot have in a file name, the hash keeps urls that
+    # only differ in those characters apart
+    filename = re.sub(r"[^A-Za-z0-9_-]", "_", url.replace(config.url, "").replace("/", "_").replace(".", "-"))[:100]
+    filename = f"{filename}_{blake2b(url.encode('utf-8'), digest_size=4).hexdigest()}"
+    return os.path.join(StepCounter.path_root, save_folder, f"{filename}.{ScreenshotWriter.extension()}")
+
+
+class ScreenshotWriter:
+    def __init__(self, max_width=None, quality=70):
+        """ScreenshotWriter:
+        Use: .capture to grab a screenshot from a browser, encoding and writing happen on a background thread
+        Use: .wait to wait for a single queued screenshot to be written
+        Use: .close to wait for every queued screenshot to be written
+        :param max_width: Screenshots wider than this many pixels are scaled down, requires Pillow
+        :param quality: Compression quality used for jpeg and webp images"""
+        self.max_width = max_width
+        self.quality = quality
+        self.queue = queue.Queue()
+        self.written = {}  # path of each queued screenshot to an event set once it has been written or has failed
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._write_loop, name="screenshot-writer", daemon=True)
+        self.thread.start()
+
+        if Image is None and (ScreenshotWriter.image_format() != "png" or max_width):
+            xlogging(3, "Pillow is not installed, screenshots will be saved as full size png images")
+
+    @staticmethod
+    def image_format():
+        """Returns the image format set in the runtime argument 'imageformat', defaults to png"""
+        if Image is None:
+            return "png"
+        return config.image_format
+
+    @staticmethod
+    def extension():
+        """Returns the file extension matching the image format"""
+        return "jpg" if ScreenshotWriter.image_format() == "jpeg" else ScreenshotWriter.image_format()
+
+    def capture(self, browser, path, on_written=None):
+        """Grabs the browser's screenshot as png bytes and queues it to be written
+        :param browser: Driver showing the page to capture
+        :param path: Path of the image file
+        :param on_written: Called on the writer thread once the file has been written, not called if writing fails"""
+        if hasattr(browser, "get_full_page_screenshot_as_png"):  # Only Firefox can capture the whole page
+            png = browser.get_full_page_screenshot_as_png()
+        else:
+            png = browser.get_screenshot_as_png()
+        with self.lock:
+            self.written[path] = threading.Event()
+        self.queue.put([png, path, on_written])
+
+    def wait(self, path, timeout=30):
+        """Waits for a queued screenshot to be written or to fail, returns at once for paths that are not queued"""
+        with self.lock:
+            written = self.written.get(path)
+        if written is not None:
+            written.wait(timeout)
+
+    def _encode(self, png):
+        """Scales and re-encodes a png screenshot according to the runtime arguments
+        :return: The image bytes"""
+        if Image is None or (self.image_format() == "png" and not self.max_width):
+            return png
+
+        image = Image.open(io.BytesIO(png))
+        if self.max_width and image.width > self.max_width:
+            image = image.resize((self.max_width, round(image.height * self.max_width / image.width)))
+        if self.image_format() == "jpeg":
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format=self.image_format().upper(), quality=self.quality, optimize=True)
+        return output.getvalue()
+
+    def _write_loop(self):
+        """Encodes and writes queued screenshots until the writer is closed"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            png, path, on_written = item
+            try:
+                image = self._encode(png)
+                with metrics.stage("disk_io"):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as file:
+                        file.write(image)
+                if on_written is not None:
+                    on_written()
+            except Exception as e:  # Any failure only loses this screenshot, the thread carries on with the next one
+                xlogging(4, f"Unable to save screenshot {path}: {e}")
+            finally:
+                with self.lock:
+                    written = self.written.pop(path, None)
+                if written is not None:
+                    written.set()
+
+    def close(self):
+        """Waits for every queued screenshot to be written"""
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,110 @@
+""" Seeds the crawl frontier from robots.txt and sitemaps, and applies robots.txt rules to the crawl """
+import gzip
+import io
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree.ElementTree import ParseError, iterparse
+
+from urllib3.exceptions import HTTPError
+
+from base.custom_logging import xlogging
+
+USER_AGENT = "Dead-Link-Checker"
+
+
+class SiteSeeder:
+    def __init__(self, base_url, http_checker, max_nesting=5):
+        """SiteSeeder:
+        Use: .load_robots once before the crawl starts
+        Use: .allowed to check a url against robots.txt
+        Use: .urls to stream the page urls listed in sitemaps
+        :param base_url: Url the crawl starts from, robots.txt is read from its root
+        :param http_checker: HttpChecker used to fetch robots.txt and the sitemaps
+        :param max_nesting: How many sitemap index files deep sitemaps are followed"""
+        parsed = urlparse(base_url)
+        self.root = f"{parsed.scheme}://{parsed.netloc}"
+        self.http_checker = http_checker
+        self.max_nesting = max_nesting
+        self.robots = RobotFileParser(self.root + "/robots.txt")
+
+    def load_robots(self):
+        """Fetches and parses robots.txt, a missing file allows everything and an unauthorised one disallows everything"""
+        response = self.http_checker.open(self.root + "/robots.txt")
+        if response is None:
+            self.robots.allow_all = True
+            return
+        try:
+            body = response.read()
+        finally:
+            response.release_conn()
+
+        if response.status in (401, 403):
+            self.robots.disallow_all = True
+        elif response.status >= 400:
+            self.robots.allow_all = True
+        else:
+            self.robots.parse(body.decode("utf-8", errors="replace").splitlines())
+        xlogging(2, f"Read robots.txt from {self.root}, status: {response.status}")
+
+    def allowed(self, url):
+        """Returns true if robots.txt allows the url to be crawled"""
+        return self.robots.can_fetch(USER_AGENT, url)
+
+    def sitemaps(self):
+        """Gets the sitemaps listed in robots.txt, or the conventional location if it lists none
+        :return: List of sitemap urls"""
+        return self.robots.site_maps() or [self.root + "/sitemap.xml"]
+
+    def _stream(self, response, url):
+        """Wraps a sitemap response so it is decompressed as it is read when it is a gzip file"""
+        reader = io.BufferedReader(response)
+        if reader.peek(2)[:2] == b"\x1f\x8b" or url.endswith(".gz"):
+            return gzip.GzipFile(fileobj=reader)
+        return reader
+
+    def _parse(self, sitemap_url):
+        """Streams a single sitemap or sitemap index
+        :return: Generator of [is an index, loc] for each entry"""
+        response = self.http_checker.open(sitemap_url)
+        if response is None or response.status >= 400:
+            xlogging(3, f"Unable to read sitemap: {sitemap_url}")
+            if response is not None:
+                response.release_conn()
+            return
+
+        is_index = None
+        try:
+            for event, element in iterparse(self._stream(response, sitemap_url), events=("start", "end")):
+                tag = element.tag.rsplit("}", 1)[-1]
+                if event == "start":
+                    if is_index is None:
+                        is_index = tag == "sitemapindex"
+                        root = element
+                    continue
+                if tag == "loc" and element.text:
+                    yield [is_index, urljoin(sitemap_url, element.text.strip())]
+                elif tag in ("url", "sitemap"):
+                    root.clear()  # Entries are handled as they stream past, so nothing needs to stay in memory
+        except (ParseError, OSError, EOFError, HTTPError) as e:
+            xlogging(3, f"Sitemap {sitemap_url} could not be fully read: {e}")
+        finally:
+            response.release_conn()
+
+    def urls(self, sitemap_urls=None):
+        """Streams every page url from the sitemaps, following sitemap index files
+        :param sitemap_urls: Sitemaps to start from, defaults to the ones in robots.txt
+        :return: Generator of [page url, sitemap it is listed in]"""
+        pending = [[url, 0] for url in (sitemap_urls or self.sitemaps())]
+        seen = set()
+        while pending:
+            sitemap_url, nesting = pending.pop()
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            xlogging(2, f"Reading sitemap: {sitemap_url}")
+
+            for is_index, loc in self._parse(sitemap_url):
+                if not is_index:
+                    yield [loc, sitemap_url]
+                elif nesting < self.max_nesting:
+                    pending.append([loc, nesting + 1])
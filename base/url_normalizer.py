@@ -0,0 +1,79 @@
+""" Rewrites urls into one canonical form so variants of the same page are only visited once """
+import posixpath
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query keys that only track the visitor and never change the page
+TRACKING_PARAMS = ["utm_*", "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl"]
+
+# Extensions of urls that are still pages rather than files to download
+PAGE_EXTENSIONS = {".html", ".htm", ".shtml", ".xhtml", ".php", ".asp", ".aspx", ".jsp", ".cfm"}
+
+
+def is_file_link(url):
+    """Checks if a url points at a file such as an image or a download, going by the extension of its path
+    :param url: Absolute url
+    :return: True/False"""
+    extension = posixpath.splitext(urlsplit(url).path)[1].lower()
+    return 2 <= len(extension) <= 5 and extension not in PAGE_EXTENSIONS
+
+
+class UrlNormalizer:
+    def __init__(self, keep_query=None, ignore_query=None, trailing_slash="keep", host_aliases=None, cache_size=100000):
+        """UrlNormalizer:
+        Use: .normalize to get the canonical form of an absolute url, results are memoized
+        :param keep_query: Only these query keys are kept, None keeps every key that is not ignored
+        :param ignore_query: Query key patterns that are dropped, defaults to common tracking parameters
+        :param trailing_slash: 'keep' leaves paths alone, 'strip' removes and 'add' appends a trailing slash
+        :param host_aliases: Dictionary of host names to the host they should be treated as, e.g. www.site.com: site.com
+        :param cache_size: Number of normalized urls remembered"""
+        if trailing_slash not in ("keep", "strip", "add"):
+            raise Exception(f"'trailingslash' must be 'keep', 'strip' or 'add', not '{trailing_slash}'")
+
+        self.keep_query = set(keep_query) if keep_query is not None else None
+        self.ignore_query = ignore_query if ignore_query is not None else TRACKING_PARAMS
+        self.trailing_slash = trailing_slash
+        self.host_aliases = {alias.lower(): host.lower() for alias, host in (host_aliases or {}).items()}
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _keep_key(self, key):
+        """Returns true if a query key is part of the canonical url"""
+        if self.keep_query is not None and key not in self.keep_query:
+            return False
+        for pattern in self.ignore_query:
+            if fnmatchcase(key, pattern):
+                return False
+        return True
+
+    def _normalize(self, url):
+        """Lower cases the scheme and host, drops default ports, user info and fragments, applies host aliases,
+        the trailing slash rule and the query rules, and sorts the remaining query
+        :param url: Absolute url
+        :return: The canonical url, or None if it is not a valid http(s) url"""
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+
+        host = parts.hostname.lower()
+        host = self.host_aliases.get(host, host)
+        if ":" in host:  # hostname drops the brackets around IPv6 addresses, they are needed to tell the port apart
+            host = f"[{host}]"
+        netloc = host if port is None or port == DEFAULT_PORTS[scheme] else f"{host}:{port}"
+
+        path = parts.path or "/"
+        if self.trailing_slash == "strip" and path != "/":
+            path = path.rstrip("/") or "/"
+        elif self.trailing_slash == "add" and not path.endswith("/") and not posixpath.splitext(path)[1]:
+            path += "/"
+
+        query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if self._keep_key(key))
+
+        return urlunsplit((scheme, netloc, path, urlencode(query), ""))
@@ -0,0 +1,295 @@
+""" Interchangeable url set backends, so the memory used per url can be traded against exactness and speed """
+import heapq
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+from base.config import config
+
+
+def fingerprint(url):
+    """Hashes a url to a 64 bit integer, collisions are negligible below billions of urls
+    :return: Unsigned 64 bit integer"""
+    return int.from_bytes(blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class MemoryUrlSet:
+    def __init__(self):
+        """MemoryUrlSet:
+        Exact set of full url strings, the fastest backend and the original behaviour
+        Use: .add_if_new to atomically check and add a url
+        Use: .dump and .load to save and restore the contents"""
+        self.urls = set()
+        self.lock = threading.Lock()
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def add(self, url):
+        with self.lock:
+            self.urls.add(url)
+
+    def add_if_new(self, url):
+        """Adds a url unless it is already in the set
+        :return: True if the url was added"""
+        with self.lock:
+            if url in self.urls:
+                return False
+            self.urls.add(url)
+            return True
+
+    def update(self, urls):
+        urls = list(urls)  # a generator is not run while the lock is held
+        with self.lock:
+            self.urls.update(urls)
+
+    def dump(self, exclude=()):
+        """Gets the contents in a JSON serialisable form
+        :param exclude: Urls left out of the dump
+        :return: List of urls"""
+        exclude = set(exclude)
+        with self.lock:
+            return [url for url in self.urls if url not in exclude]
+
+    def load(self, items):
+        """Restores contents returned by .dump"""
+        self.update(items)
+
+    def close(self):
+        """Nothing to release, kept so every backend can be closed the same way"""
+
+
+class FingerprintUrlSet:
+    def __init__(self, buffer_size=65536):
+        """FingerprintUrlSet:
+        Keeps an 8 byte fingerprint per url in a sorted array instead of the url itself
+        Use: .add_if_new to atomically check and add a url
+        Use: .dump and .load to save and restore the fingerprints
+        :param buffer_size: Number of new fingerprints held in a small set before being merged into the array"""
+        self.sorted = array("Q")
+        self.recent = set()
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+
+    def _contains(self, value):
+        """Looks up a fingerprint, the caller must hold the lock"""
+        if value in self.recent:
+            return True
+        index = bisect_left(self.sorted, value)
+        return index < len(self.sorted) and self.sorted[index] == value
+
+    def _add(self, value):
+        """Adds a fingerprint, merging the recent ones into the sorted array when the buffer is full,
+        the caller must hold the lock"""
+        self.recent.add(value)
+        if len(self.recent) >= self.buffer_size:
+            self.sorted = array("Q", heapq.merge(self.sorted, sorted(self.recent)))  # recent never overlaps sorted
+            self.recent = set()
+
+    def __contains__(self, url):
+        with self.lock:
+            return self._contains(fingerprint(url))
+
+    def __len__(self):
+        return len(self.sorted) + len(self.recent)
+
+    def add(self, url):
+        self.add_if_new(url)
+
+    def add_if_new(self, url):
+        """Adds a url unless its fingerprint is already in the set
+        :return: True if the url was added"""
+        value = fingerprint(url)
+        with self.lock:
+            if self._contains(value):
+                return False
+            self._add(value)
+            return True
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def dump(self, exclude=()):
+        """Gets the contents in a JSON serialisable form
+        :param exclude: Urls left out of the dump
+        :return: List of fingerprints"""
+        exclude = {fingerprint(url) for url in exclude}
+        with self.lock:
+            return [value for value in list(self.sorted) + list(self.recent) if value not in exclude]
+
+    def load(self, items):
+        """Restores fingerprints returned by .dump"""
+        with self.lock:
+            for value in items:
+                if not self._contains(value):
+                    self._add(value)
+
+    def close(self):
+        """Nothing to release, kept so every backend can be closed the same way"""
+
+
+class DiskUrlSet:
+    def __init__(self, path):
+        """DiskUrlSet:
+        Keeps url fingerprints in an SQLite file so memory use does not grow with the number of urls
+        Use: .add_if_new to atomically check and add a url
+        Use: .dump and .load to save and restore the fingerprints
+        Use: .close once the set is no longer needed to delete the file
+        :param path: Location of the SQLite file, it is emptied when the set is created"""
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("DROP TABLE IF EXISTS urls")
+        self.connection.execute("CREATE TABLE urls (fingerprint INTEGER PRIMARY KEY) WITHOUT ROWID")
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _signed(value):
+        """SQLite integers are signed 64 bit"""
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    def __contains__(self, url):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM urls WHERE fingerprint = ?", (self._signed(fingerprint(url)),)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def add(self, url):
+        self.add_if_new(url)
+
+    def add_if_new(self, url):
+        """Adds a url unless its fingerprint is already in the set
+        :return: True if the url was added"""
+        with self.lock:
+            cursor = self.connection.execute("INSERT OR IGNORE INTO urls VALUES (?)", (self._signed(fingerprint(url)),))
+            return cursor.rowcount == 1
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def dump(self, exclude=()):
+        """Gets the contents in a JSON serialisable form
+        :param exclude: Urls left out of the dump
+        :return: List of fingerprints"""
+        exclude = {fingerprint(url) for url in exclude}
+        with self.lock:
+            rows = self.connection.execute("SELECT fingerprint FROM urls").fetchall()
+        return [value % (1 << 64) for value, in rows if value % (1 << 64) not in exclude]
+
+    def load(self, items):
+        """Restores fingerprints returned by .dump"""
+        with self.lock:
+            self.connection.executemany("INSERT OR IGNORE INTO urls VALUES (?)", [(self._signed(value),) for value in items])
+
+    def close(self):
+        """Closes the connection and deletes the SQLite file"""
+        with self.lock:
+            self.connection.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class BloomUrlSet:
+    def __init__(self, backend, capacity=1000000, error_rate=0.01):
+        """BloomUrlSet:
+        Bloom filter in front of another url set, urls the filter has never seen skip the slower backend lookup
+        :param backend: The url set that gives the exact answer
+        :param capacity: Expected number of urls, the false positive rate rises above this
+        :param error_rate: Chance of a url that was never added needing a backend lookup"""
+        self.backend = backend
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.lock = threading.Lock()
+
+    def _positions(self, value):
+        """Bit positions of a url's fingerprint using double hashing of its two 32 bit halves"""
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def _might_contain(self, url):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint(url)))
+
+    def _set(self, value):
+        """Sets a fingerprint's bits, the caller must hold the lock
+        :return: True if any of the bits was not set before, so the url was never added"""
+        new = False
+        for position in self._positions(value):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                self.bits[position >> 3] |= 1 << (position & 7)
+                new = True
+        return new
+
+    def __contains__(self, url):
+        return self._might_contain(url) and url in self.backend
+
+    def __len__(self):
+        return len(self.backend)
+
+    def add(self, url):
+        self.add_if_new(url)
+
+    def add_if_new(self, url):
+        """Adds a url unless it is already in the set, a url the filter has never seen is inserted straight into the
+        backend without looking it up first
+        :return: True if the url was added"""
+        with self.lock:
+            if self._set(fingerprint(url)):
+                # Inside the filter's lock so a second add of the same url finds it in the backend, the backend's add
+                # takes the backend's own lock so it is safe against a dump running on another thread
+                self.backend.add(url)
+                return True
+        return self.backend.add_if_new(url)
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def dump(self, exclude=()):
+        return self.backend.dump(exclude)
+
+    def load(self, items):
+        """Restores contents returned by .dump, which are urls or fingerprints depending on the backend"""
+        self.backend.load(items)
+        with self.lock:
+            for item in items:
+                self._set(item if isinstance(item, int) else fingerprint(item))
+
+    def close(self):
+        self.backend.close()
+
+
+def new_url_set(name):
+    """Creates a url set using the backend chosen in the runtime argument 'urlset' (memory, fingerprint or disk),
+    wrapped in a Bloom filter if the runtime argument 'bloom' is set to y
+    :param name: Name of the set, used for the file name of disk backed sets
+    :return: The url set"""
+    backend = config.url_set
+    if backend == "memory":
+        url_set = MemoryUrlSet()
+    elif backend == "fingerprint":
+        url_set = FingerprintUrlSet()
+    elif backend == "disk":
+        folder = config.url_set_dir or tempfile.gettempdir()
+        url_set = DiskUrlSet(os.path.join(folder, f"dead_link_checker_{os.getpid()}_{name}.db"))
+    else:
+        raise Exception(f"'urlset' must be 'memory', 'fingerprint' or 'disk', not '{backend}'")
+
+    if config.bloom:
+        url_set = BloomUrlSet(url_set, config.bloom_size)
+    return url_set
@@ -0,0 +1,98 @@
+""" Keeps url statuses between runs so unchanged pages do not need to be rendered again """
+import sqlite3
+import threading
+import time
+
+
+class UrlStore:
+    def __init__(self, path):
+        """UrlStore:
+        Use: .get to read what the previous run recorded for a url
+        Use: .record to save a url's status, validators and referrer
+        Use: .set_links and .links to save and reuse the links found on a page
+        :param path: Location of the SQLite database, created if it does not exist"""
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                status INTEGER,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                last_checked REAL,
+                links_extracted INTEGER DEFAULT 0
+            )"""
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS referrers (url TEXT, referrer TEXT, PRIMARY KEY (url, referrer))")
+        # external is 0 for internal links, 1 for external links and 2 for assets and downloads
+        self.connection.execute("CREATE TABLE IF NOT EXISTS links (page TEXT, link TEXT, external INTEGER, PRIMARY KEY (page, link))")
+        self.lock = threading.Lock()
+        self.pending_writes = 0
+
+    def _written(self):
+        """Commits in batches rather than once per write, the caller must hold the lock"""
+        self.pending_writes += 1
+        if self.pending_writes >= 100:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def get(self, url):
+        """Gets what was recorded for a url
+        :return: [status, content type, etag, last modified, content hash] or None if the url has never been checked"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT status, content_type, etag, last_modified, content_hash FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        return list(row) if row is not None else None
+
+    def record(self, url, status, referrer=None, content_type=None, etag=None, last_modified=None, content_hash=None):
+        """Saves the result of checking a url, validators that are not passed keep their previous values"""
+        with self.lock:
+            self.connection.execute(
+                """INSERT INTO urls (url, status, content_type, etag, last_modified, content_hash, last_checked)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    status = excluded.status,
+                    content_type = COALESCE(excluded.content_type, content_type),
+                    etag = COALESCE(excluded.etag, etag),
+                    last_modified = COALESCE(excluded.last_modified, last_modified),
+                    content_hash = COALESCE(excluded.content_hash, content_hash),
+                    last_checked = excluded.last_checked""",
+                (url, status, content_type, etag, last_modified, content_hash, time.time()),
+            )
+            if referrer is not None:
+                self.connection.execute("INSERT OR IGNORE INTO referrers (url, referrer) VALUES (?, ?)", (url, referrer))
+            self._written()
+
+    def set_links(self, page, internal_links, external_links, assets=()):
+        """Replaces the links recorded for a page with every link found on it on this run, including the ones other
+        pages linked to first, so the whole page can be replayed when it has not changed"""
+        with self.lock:
+            self.connection.execute("DELETE FROM links WHERE page = ?", (page,))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO links (page, link, external) VALUES (?, ?, ?)",
+                [(page, link, 0) for link in internal_links]
+                + [(page, link, 1) for link in external_links]
+                + [(page, link, 2) for link in assets],
+            )
+            self.connection.execute("UPDATE urls SET links_extracted = 1 WHERE url = ?", (page,))
+            self._written()
+
+    def links(self, page):
+        """Gets the links recorded for a page
+        :return: [set of internal links, set of external links, set of assets] or None if links were never gathered from
+        the page"""
+        with self.lock:
+            extracted = self.connection.execute("SELECT links_extracted FROM urls WHERE url = ?", (page,)).fetchone()
+            if extracted is None or not extracted[0]:
+                return None
+            rows = self.connection.execute("SELECT link, external FROM links WHERE page = ?", (page,)).fetchall()
+        return [{link for link, external in rows if external == kind} for kind in (0, 1, 2)]
+
+    def close(self):
+        """Commits any outstanding writes and closes the database"""
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
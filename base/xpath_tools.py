@@ -5,7 +5,8 @@ from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.wait import WebDriverWait
 
 from base.custom_logging import StepCounter, xlogging
-from base.driver_setup import driver, get_arg
+from base.config import config
+from base.driver_setup import get_driver
 
 
 class Xpath:
@@ -79,9 +80,10 @@ class Element:
         Xpath("div", "class", "progress").absolute(),
     ]
 
-    def __init__(self, xpath, wait_time=0):
+    def __init__(self, xpath, wait_time=0, browser=None):
         self.xpath = xpath
         self.wait_time = wait_time
+        self.driver = browser if browser is not None else get_driver()
 
         self.log_win_custom_wait = (
             f"Waiting up to: {self.wait_time} second(s) to locate a single element's xpath, with a value of: {self.xpath}"
@@ -99,7 +101,7 @@ class Element:
             StepCounter().count_step(text, 0, substep=True)
 
     def log_xpath(self):
-        if get_arg("colors") == "y":
+        if config.colors:
             if self.wait_time != 0:
                 self.step_log(f"{Fore.CYAN}{self.log_win_custom_wait}")
             else:
@@ -125,7 +127,7 @@ class Element:
 
         if self.xpath not in Element.ignored_xpaths:
             try:
-                WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
+                WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
             except TimeoutException as e:
                 StepCounter().log_result(f"\t Unable to find element: {self.xpath}")
                 raise e
@@ -135,7 +137,7 @@ class Element:
             except MoveTargetOutOfBoundsException as e:
                 StepCounter().log_result(f"\t Element is outside of view port, consider using Scroller class, element: {self.xpath}")
                 raise e
-        return WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
+        return WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
 
     def presence_multi(self):
         self.log_win_custom_wait = f"Waiting up to: {self.wait_time} second(s) to locate multiple elements, with an xpath of: {self.xpath}"
@@ -149,8 +151,8 @@ class Element:
         self.log_xpath()
 
         try:
-            WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_all_elements_located((By.XPATH, self.xpath)))
-            return WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(
+            WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_all_elements_located((By.XPATH, self.xpath)))
+            return WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(
                 ec.presence_of_all_elements_located((By.XPATH, self.xpath))
             )
         except TimeoutException:
@@ -171,11 +173,11 @@ class Element:
 
         if self.xpath not in Element.ignored_xpaths:
             try:
-                WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
+                WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
             except TimeoutException as e:
                 StepCounter().log_result(f"\t Element still visible: {self.xpath}")
                 raise e
-        return WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
+        return WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
 
     def clickable(self):
         self.log_win_custom_wait = (
@@ -192,7 +194,7 @@ class Element:
 
         if self.xpath not in Element.ignored_xpaths:
             try:
-                WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.element_to_be_clickable((By.XPATH, self.xpath)))
+                WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.element_to_be_clickable((By.XPATH, self.xpath)))
             except TimeoutException as e:
                 StepCounter().log_result(f"\t Unable to find element: {self.xpath}")
                 raise e
@@ -202,7 +204,7 @@ class Element:
             except MoveTargetOutOfBoundsException as e:
                 StepCounter().log_result(f"\t Element is outside of view port, consider using Scroller class, element: {self.xpath}")
                 raise e
-        return WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.element_to_be_clickable((By.XPATH, self.xpath)))
+        return WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.element_to_be_clickable((By.XPATH, self.xpath)))
 
     def is_present(self):
         self.log_win_custom_wait = (
@@ -221,7 +223,7 @@ class Element:
             if self.xpath not in Element.ignored_xpaths:
                 xlogging(3, f"Up to wait time for {self.xpath} is 0", frame_stack=2)
         try:
-            WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
+            WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.presence_of_element_located((By.XPATH, self.xpath)))
             if self.xpath not in Element.ignored_xpaths:
                 xlogging(2, f"Element {self.xpath} is present.", "y", frame_stack=2)
             return True
@@ -246,7 +248,7 @@ class Element:
         if self.wait_time == 0.0:
             xlogging(3, f"Up to wait time for {self.xpath} is 0", frame_stack=2)
         try:
-            WebDriverWait(driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
+            WebDriverWait(self.driver, self.wait_time, poll_frequency=0.01).until(ec.invisibility_of_element_located((By.XPATH, self.xpath)))
             xlogging(2, f"Element {self.xpath} is not visible.", "y", frame_stack=2)
             return False
         except TimeoutException:
@@ -0,0 +1,141 @@
+""" Crawls a synthetic site and reports throughput, peak memory and whether every injected broken link was found
+
+Usage: python -m benchmark.run browser:Chrome pages:500 fanout:5 depth:4 workers:4 browsers:2 out:bench.json
+Site arguments: pages, fanout, depth, notfound, servererrors, slow, slowdelay, redirects, hops, seed, port
+Run arguments: out (write the results as json), baseline (results json of an earlier run to compare against),
+tolerance (fraction of the baseline's pages/sec a run may lose before it fails, defaults to 0.1)
+Every other argument is passed on to the Scraper as it is, headless is the default so no display is needed
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+from base.config import config
+from base.custom_logging import StepCounter
+from base.driver_setup import quit_driver
+from benchmark.synthetic_site import SyntheticSite
+from scraper import Scraper
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module, psutil is used for this process's peak instead
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+arg = config.get
+
+
+def peak_rss_mb(children=False):
+    """Returns the peak resident set size in megabytes, ru_maxrss is in kilobytes on Linux and bytes on macOS
+    :param children: If set to True then the peak of the largest child process that has exited is returned instead
+    :return: Megabytes, or None if it cannot be read on this platform"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+    if psutil is not None and not children:
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1)  # peak_wset is Windows only
+    return None
+
+
+def megabytes(value):
+    """Formats a peak RSS for the summary"""
+    return "unavailable" if value is None else f"{value} MB"
+
+
+def compare(results, baseline_path, tolerance):
+    """Checks a run against an earlier one
+    :return: A list of regressions, empty if there are none"""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    regressions = []
+    if results["pages_per_second"] < baseline["pages_per_second"] * (1 - tolerance):
+        regressions.append(f"pages/sec dropped from {baseline['pages_per_second']} to {results['pages_per_second']}")
+    if results["peak_rss_mb"] is not None and baseline["peak_rss_mb"] is not None and results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS grew from {baseline['peak_rss_mb']} MB to {results['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    site = SyntheticSite(
+        pages=int(arg("pages", 200)),
+        fanout=int(arg("fanout", 5)),
+        depth=int(arg("depth", 4)),
+        not_found=int(arg("notfound", 10)),
+        server_errors=int(arg("servererrors", 5)),
+        slow=int(arg("slow", 5)),
+        slow_delay=float(arg("slowdelay", 0.5)),
+        redirects=int(arg("redirects", 5)),
+        hops=int(arg("hops", 3)),
+        seed=int(arg("seed", 1)),
+    )
+    base_url = site.serve(int(arg("port", 0)))
+
+    argv = [i for i in sys.argv if i.split(":", maxsplit=1)[0] != "url"] + [f"url:{base_url}", "browser:Chrome"]
+    config.load(argv)  # browser:Chrome is only a default, an earlier browser argument wins
+
+    StepCounter.path_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    scraper = Scraper(base_url)
+    found = {}
+    try:
+        for status, url, referrer in scraper.iter_crawl():
+            found[url.replace(base_url.rstrip("/"), "")] = status
+    finally:
+        elapsed = time.perf_counter() - started
+        quit_driver()  # The browser processes only count towards the children's peak once they have exited
+        site.close()
+
+    expected = site.expected_broken()
+    missed = sorted(path for path in expected if found.get(path) != expected[path])
+    unexpected = sorted(path for path in found if path not in expected)
+    pages = scraper.pages_started  # The url sets are closed once the crawl is over
+
+    results = {
+        "pages": pages,
+        "seconds": round(elapsed, 2),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else 0,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_browser_rss_mb": peak_rss_mb(children=True),
+        "requests_served": len(site.served),
+        "broken_expected": len(expected),
+        "broken_found": len(expected) - len(missed),
+        "missed": missed,
+        "unexpected": unexpected,
+        "arguments": sorted(i for i in argv[1:] if not i.startswith(("url:", "user:", "pass:"))),
+    }
+
+    print(
+        f"""
+Pages:         {results['pages']} in {results['seconds']}s
+Pages/sec:     {results['pages_per_second']}
+Peak RSS:      {megabytes(results['peak_rss_mb'])} (browsers {megabytes(results['peak_browser_rss_mb'])})
+Broken links:  {results['broken_found']} of {results['broken_expected']} found
+Missed:        {', '.join(missed) or 'none'}
+Unexpected:    {', '.join(unexpected) or 'none'}
+"""
+    )
+
+    if arg("out"):
+        with open(arg("out"), "w") as file:
+            json.dump(results, file, indent=2)
+
+    failures = []
+    if missed or unexpected:
+        failures.append("broken links reported incorrectly")
+    if arg("baseline"):
+        failures += compare(results, arg("baseline"), float(arg("tolerance", 0.1)))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+""" Generates a reproducible website with known broken links and serves it on a local http.server """
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SyntheticSite:
+    def __init__(self, pages=200, fanout=5, depth=4, not_found=10, server_errors=5, slow=5, slow_delay=0.5, redirects=5,
+                 hops=3, seed=1):
+        """SyntheticSite:
+        Use: .serve to start the site on a background thread
+        Use: .expected_broken to get the links the crawler has to report
+        :param pages: Number of regular pages, capped by what fanout and depth can reach
+        :param fanout: Number of child pages linked from each page
+        :param depth: Number of clicks from the home page to the deepest page
+        :param not_found: Number of links to pages that answer 404
+        :param server_errors: Number of links to pages that answer 500
+        :param slow: Number of links to pages that take slow_delay seconds to answer
+        :param slow_delay: Seconds a slow page sleeps before answering
+        :param redirects: Number of links that go through a redirect chain before landing on a regular page
+        :param hops: Number of redirects in each chain
+        :param seed: Seed for placing the injected links, the same arguments always build the same site"""
+        reachable = sum(fanout ** level for level in range(depth + 1)) if fanout > 1 else depth + 1
+        self.pages = min(pages, reachable)
+        self.fanout = fanout
+        self.slow_delay = slow_delay
+        self.hops = hops
+        self.server = None
+        self.served = set()  # paths requested at least once, counted by the server rather than the crawler
+        self.lock = threading.Lock()
+
+        rng = random.Random(seed)
+        self.injected = {}  # page number -> injected paths linked from that page
+        for kind, count in (("missing", not_found), ("error", server_errors), ("slow", slow), ("redirect", redirects)):
+            for number in range(count):
+                path = f"/{kind}/{number}/{hops}" if kind == "redirect" else f"/{kind}/{number}"
+                self.injected.setdefault(rng.randrange(self.pages), []).append(path)
+
+    @staticmethod
+    def page_path(number):
+        """Returns the path of a regular page, page 0 is the home page"""
+        return "/" if number == 0 else f"/page/{number}"
+
+    def children(self, number):
+        """Returns the numbers of the pages linked from a regular page"""
+        first = number * self.fanout + 1
+        return range(min(first, self.pages), min(first + self.fanout, self.pages))
+
+    def expected_broken(self):
+        """Returns {path: status} for every injected link that answers with an error"""
+        expected = {}
+        for paths in self.injected.values():
+            for path in paths:
+                if path.startswith("/missing/"):
+                    expected[path] = 404
+                elif path.startswith("/error/"):
+                    expected[path] = 500
+        return expected
+
+    def render(self, number):
+        """Builds the html of a regular page with links to its children, its parent, the home page and its injected links"""
+        links = [self.page_path(child) for child in self.children(number)]
+        if number != 0:
+            links.append(self.page_path((number - 1) // self.fanout))  # Links already seen elsewhere are common on real sites
+            links.append("/")
+        links += self.injected.get(number, [])
+        anchors = "\n".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+        return f"<!doctype html><html><head><title>Page {number}</title></head><body><ul>\n{anchors}\n</ul></body></html>"
+
+    def respond(self, path):
+        """Works out the answer to a request
+        :return: [status code, extra headers, html body]"""
+        parts = path.split("?")[0].strip("/").split("/")
+        if parts == [""]:
+            return [200, {}, self.render(0)]
+        try:
+            kind, number = parts[0], int(parts[1])
+        except (IndexError, ValueError):
+            return [404, {}, "<html><body>Not Found</body></html>"]
+
+        if kind == "page" and 0 < number < self.pages:
+            return [200, {}, self.render(number)]
+        if kind == "error":
+            return [500, {}, "<html><body>Internal Server Error</body></html>"]
+        if kind == "slow":
+            time.sleep(self.slow_delay)
+            return [200, {}, f"<html><body>Slow page {number}</body></html>"]
+        if kind == "redirect" and len(parts) == 3:
+            remaining = int(parts[2]) - 1
+            target = f"/redirect/{number}/{remaining}" if remaining > 0 else self.page_path(number % self.pages)
+            return [302, {"Location": target}, ""]
+        return [404, {}, "<html><body>Not Found</body></html>"]
+
+    def handler(self):
+        """Returns a request handler class bound to this site"""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def answer(self, send_body):
+                with site.lock:
+                    site.served.add(self.path)
+                status, headers, body = site.respond(self.path)
+                content = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(content)
+
+            def do_GET(self):
+                self.answer(True)
+
+            def do_HEAD(self):
+                self.answer(False)
+
+            def log_message(self, format, *args):
+                pass  # Request lines would drown out the crawler's own logging
+
+        return Handler
+
+    def serve(self, port=0):
+        """Starts serving the site on 127.0.0.1 from a daemon thread
+        :param port: Port to listen on, 0 picks a free one
+        :return: The base url of the site"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="synthetic-site", daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def close(self):
+        """Stops the server"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
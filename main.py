@@ -8,23 +8,53 @@ selenium_logger.setLevel(logging.ERROR)
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)-.4s:%(asctime)s:%(message)s")
 
-from base.driver_setup import get_arg
+from base.config import config
+from base.metrics import metrics
+from base.report_writers import new_report_writers
 from scraper import Scraper
 
 path_root = os.path.dirname(__file__)
 StepCounter.path_root = path_root
 
-base_url = get_arg("url")
+config.validate()  # Fail on missing arguments before anything is crawled
+base_url = config.url
 
-image_save_folder = get_arg("url").split("://")[1].replace("/", "").replace('.', '-')
+report_writers = new_report_writers(config.report) if config.report else []
 
-for http_response, broken_url, referrer in Scraper(base_url).crawl():
-    if http_response is not None:
-        print(
-            f"""
+if config.metrics_port:  # Prometheus text at /metrics and a JSON summary at /metrics.json while the crawl runs
+    metrics.serve(config.metrics_port)
+
+scraper = Scraper(base_url)
+crawl = scraper.iter_crawl()
+try:
+    for http_response, broken_url, referrer in crawl:
+        image = scraper.screenshot_path(broken_url)
+        for writer in report_writers:
+            writer.write(http_response, broken_url, referrer, image)
+
+        if http_response is not None and image is None:  # External links and assets have no screenshot
+            print(
+                f"""
+Response: {http_response}
+At:       {broken_url}
+Referer:  {referrer}
+"""
+            )
+        elif http_response is not None:
+            print(
+                f"""
 Response: {http_response}
 At:       {broken_url}
 Referer:  {referrer}
-image:    {path_root}\\{image_save_folder}__error_pages\\{broken_url.replace(get_arg('url'), '').replace('/', '_').replace('.', '-')}.png
+image:    {image}
 """
-        )
+            )
+
+        if config.failfast:  # Stop at the first broken link so CI fails quickly
+            raise SystemExit(1)
+finally:
+    crawl.close()  # Stops the workers and drops the queued external and asset checks when the crawl ended early
+    for writer in report_writers:
+        writer.close()
+    if config.metrics:
+        metrics.write_json(config.metrics)
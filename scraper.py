@@ -1,24 +1,30 @@
-import os
 import time
-import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from selenium.common.exceptions import (
-    StaleElementReferenceException,
     TimeoutException,
     WebDriverException,
 )
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as ec
-from selenium.webdriver.support.wait import WebDriverWait
 
-from base.custom_logging import StepCounter, xlogging
-from base.driver_setup import driver, get_arg
+from base.checkpoint import Checkpoint
+from base.custom_logging import xlogging
+from base.driver_pool import DriverPool
+from base.config import config
 
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 
 import colorama
 
-from base.record_time import RecordTime
+from base.external_checker import ExternalChecker
+from base.frontier import Frontier
+from base.http_checker import HttpChecker
+from base.metrics import metrics
+from base.rate_limiter import HostRateLimiter
+from base.sitemap import SiteSeeder
+from base.screenshots import ANCHOR_HREFS_SCRIPT, HIGHLIGHT_LINK_SCRIPT, ScreenshotWriter, error_image_path
+from base.url_normalizer import TRACKING_PARAMS, UrlNormalizer, is_file_link
+from base.url_sets import new_url_set
+from base.url_store import UrlStore
 from base.xpath_tools import Element
 
 colorama.init()
@@ -29,6 +35,65 @@ GRAY = colorama.Fore.LIGHTBLACK_EX
 RESET = colorama.Fore.RESET
 YELLOW = colorama.Fore.YELLOW
 
+# Returns the raw href, resolved url, text and page position of every anchor so links need no per-element round trips,
+# along with the resolved url of every image, script, stylesheet, icon and media source the page loads
+GATHER_LINKS_SCRIPT = """
+const links = Array.from(document.querySelectorAll("a[href]"), (a) => {
+    const rect = a.getBoundingClientRect();
+    return {
+        href: a.getAttribute("href"),
+        absolute: a.href,
+        text: a.innerText.trim().slice(0, 100),
+        x: Math.round(rect.left + window.scrollX),
+        y: Math.round(rect.top + window.scrollY),
+        width: Math.round(rect.width),
+        height: Math.round(rect.height),
+        download: a.hasAttribute("download"),
+    };
+});
+const assets = new Set();
+const resolve = (url) => { try { assets.add(new URL(url.trim(), document.baseURI).href); } catch (e) {} };
+document.querySelectorAll("img[src], script[src], source[src], video[src], audio[src]").forEach((e) => resolve(e.getAttribute("src")));
+document.querySelectorAll("img[srcset], source[srcset]").forEach((e) => {
+    e.getAttribute("srcset").split(",").forEach((candidate) => { if (candidate.trim()) { resolve(candidate.trim().split(/\\s+/)[0]); } });
+});
+document.querySelectorAll("link[href]").forEach((e) => {
+    if (/stylesheet|icon|preload|manifest/i.test(e.rel)) { resolve(e.getAttribute("href")); }
+});
+return {links: links, assets: Array.from(assets)};
+"""
+
+
+# Resolves once the number of anchors has not changed for arguments[0] ms, or after arguments[1] ms at the most.
+# A document marked by MARK_DOCUMENT_SCRIPT is the page before the navigation and never counts as settled
+WAIT_FOR_LINKS_SCRIPT = """
+const [quiet, limit, done] = arguments;
+const started = Date.now();
+let last = -1;
+let stableSince = started;
+const check = () => {
+    const count = document.querySelectorAll("a[href]").length;
+    if (count !== last || document.readyState === "loading" || window.deadLinkCheckerLeft) {
+        last = count;
+        stableSince = Date.now();
+    }
+    if (Date.now() - stableSince >= quiet || Date.now() - started >= limit) {
+        done(window.deadLinkCheckerLeft ? null : count);
+    } else {
+        setTimeout(check, 50);
+    }
+};
+check();
+"""
+
+# Marks the current document so WAIT_FOR_LINKS_SCRIPT can tell it apart from the next one with pageload:none
+MARK_DOCUMENT_SCRIPT = "window.deadLinkCheckerLeft = true;"
+
+LINKS_QUIET_MS = 500  # anchors must stay the same for this long before a page counts as settled
+
+# Parts of the error messages Chrome and Firefox give when the document is replaced while a script is waiting on it
+DOCUMENT_UNLOADED_ERRORS = ("document unloaded", "document was unloaded", "execution context was destroyed")
+
 
 class Scraper:
     def __init__(self, url):
@@ -37,130 +102,343 @@ class Scraper:
         :type url: string
         """
         self.url = url  # url to start the scraping from
+        if config.url is None:  # used as a library, screenshots and basic auth are relative to this url
+            config.url = url
+
+        self.cookie_policy_dismissed = set()  # browsers in which the click action was successful
+        self.disclaimer_accepted = set()  # browsers in which the click action was successful
+
+        # url sets use the backend chosen in the runtime arguments 'urlset' and 'bloom', see base/url_sets.py
+        self.internal_urls = new_url_set("internal")  # unique urls of the same domain as the url to be scraped
+        self.external_urls = new_url_set("external")  # unique urls that are not part of the domain of the url to be scraped
+        self.visited_urls = new_url_set("visited")  # unique urls of the same domain that have already been visited
+
+        self.hrefs = new_url_set("hrefs")  # TODO: Make this a list and figure out a way to flag duplicates from the same page in a useful manner
+
+        self.broken_links_info = []  # list of lists containing response code, url being scraped and their referrer
+        self.reported = 0  # number of broken_links_info entries already yielded by iter_crawl
+        self.captured = set()  # broken urls whose screenshot has been written, external links and assets never have one
 
-        self.cookie_policy_dismissed = False  # if the click action is successful, then this is set to True
-        self.disclaimer_accepted = False  # if the click action is successful, then this is set to True
+        self.pages_started = 0  # pages handed to a worker, counted against the runtime argument 'maxpages'
+        self.deadline = None  # time.monotonic() value set from the runtime argument 'deadline' when the crawl starts
 
-        self.internal_urls = set()  # list of unique urls of the same domain as the url to be scraped
-        self.external_urls = set()  # list of unique urls of urls that are not part of the domain of the url to be scraped
-        self.visited_urls = set()  # list of unique urls of the same domain as the url to be scraped that has already been visited
+        self.workers = config.workers  # number of pages processed concurrently
+        # browsers lent to workers, swapped for fresh ones after 'recycleafter' pages or once they use 'maxrss' MB
+        self.drivers = DriverPool(config.browsers, config.recycle_after, config.max_rss, self.carry_over_clicks)
 
-        self.hrefs = set()  # TODO: Make this a list and figure out a way to flag duplicates from the same page in a useful manner
-        self.depth = 0  # Tracks how deep the scraper is in the tree
-        self.base_url = True  # A flag indicating whether the current url being scraped is the base url from the arguments
+        # per host request rate shared by every worker, the runtime argument 'rate' is the starting number of seconds
+        # between requests to a host and 'maxrate' the most requests per second a healthy host is ramped up to, which
+        # is the 'rate' itself unless 'maxrate' is given
+        self.rate_limiter = HostRateLimiter(1 / config.rate if config.rate and config.rate > 0 else None, config.max_rate)
 
-        self.check_url = None  # Current url being scraped
-        self.parent_url = None  # Referrer to current url being scraped
+        self.ignore_partals = config.ignore  # list of url fragments that will be ignored when gathering hrefs
+        self.js_partials = config.js_pages  # list of url fragments for pages that must be rendered in the browser
 
-        if get_arg("ignore") is not None:
-            self.ignore_partals = get_arg("ignore").split("|")  # list of url fragments that will be ignored when gathering hrefs
+        self.normalizer = UrlNormalizer(  # canonical form of every url so variants of a page are visited once
+            config.keep_query,
+            TRACKING_PARAMS + config.ignore_query if config.ignore_query else None,
+            config.trailing_slash,
+            config.host_aliases,
+        )
+
+        # statuses recorded on previous runs, used to skip rendering pages that have not changed
+        self.url_store = UrlStore(config.store) if config.store else None
+
+        # checks status codes without the browser, the url store relies on it for conditional requests
+        self.http_checker = HttpChecker(rate_limiter=self.rate_limiter) if config.fast or self.url_store is not None else None
+
+        if config.external:  # checks external links in the background while the crawl carries on
+            self.external_checker = ExternalChecker(
+                config.external_workers,
+                config.host_limit,
+                self.rate_limiter,
+                self.broken_links_info.append,  # reported with the internal results as they are found
+            )
+        else:
+            self.external_checker = None
+
+        if config.assets:  # images, scripts, stylesheets and downloads are checked with HEAD requests, never rendered
+            self.asset_checker = ExternalChecker(
+                config.external_workers,
+                config.host_limit,
+                self.rate_limiter,
+                self.broken_links_info.append,
+                "asset",
+                urlparse(url).netloc,  # assets on our own domain may be behind the basic auth
+            )
         else:
-            self.ignore_partals = None
+            self.asset_checker = None
 
-        self.processing_links = RecordTime("Processing links and images")  # Start and stop timer, used for limit rating
-        self.broken_links_info = []  # list of lists containing response code, url being scraped and their referrer
+        if config.sitemap or config.robots:  # seeds the frontier from sitemaps and reads robots.txt
+            self.seeder = SiteSeeder(self.url, self.http_checker or HttpChecker(rate_limiter=self.rate_limiter))
+        else:
+            self.seeder = None
 
-    def is_valid(self, href):
-        """Checks whether `url` is a valid URL."""
-        parsed = urlparse(href)
-        return bool(parsed.netloc) and bool(parsed.scheme)
+        if config.checkpoint or config.resume:  # saves progress so the crawl can be resumed after a crash
+            self.checkpoint = Checkpoint(config.checkpoint or "checkpoint.json.gz", config.checkpoint_every)
+        else:
+            self.checkpoint = None
 
-    def rate_limiter(self):
-        """If a rate limit is set then wait up to that duration before continuing with the next request"""
-        if not get_arg("rate"):
-            return
-        while self.processing_links.stop()[0] < int(get_arg("rate")):
-            time.sleep(0.1)
+        if config.screenshots:  # screenshots are only taken of broken links
+            self.screenshots = ScreenshotWriter(config.max_width)
+        else:
+            self.screenshots = None
 
-    def go_to_url(self):
-        """ Error handling for going to a page """
+    def go_to_url(self, url, parent_url, browser):
+        """ Error handling for going to a page, pages the host throttles are loaded again once it stops backing off and
+        pages that error in the browser are loaded again up to 'navretries' times, waiting longer each time.
+        Raises WebDriverException if the browser session has crashed or the retries run out """
         neterror = True
+        throttled = 0
+        errors = 0
         while neterror:
             try:
-                if not self.base_url:
-                    self.rate_limiter()
-                driver.get(self.check_url)
-                self.processing_links.start()  # Start timer
+                self.rate_limiter.acquire(url)
+                started = time.perf_counter()
+                self.navigate(url, browser)
+                status = browser.status_index.peek(url)
+                self.rate_limiter.feedback(url, status, time.perf_counter() - started)
+                if self.rate_limiter.throttled(status) and throttled < 3:
+                    throttled += 1
+                    metrics.count("retries")
+                    xlogging(3, f"Response '{status}' for url:{url}, backing off before trying again")
+                    browser.status_index.status(url)  # Forget the throttled response so the retry is indexed
+                    continue
                 neterror = False
             except TimeoutException:
-                xlogging(4, f"UNABLE TO VISIT: {self.check_url} FROM: {self.parent_url}")
-                self.broken_links_info.append([None, self.check_url, self.parent_url])
+                xlogging(4, f"UNABLE TO VISIT: {url} FROM: {parent_url}")
+                self.broken_links_info.append([None, url, parent_url])
+                metrics.count("errors")
                 return
             except WebDriverException:
-                xlogging(4, "Page errored, waiting 30 seconds before trying again")
-                time.sleep(30)
-
-    def visited(self):
-        """ Returns true if the currently scraped url is in the visited urls """
-        if self.check_url in self.visited_urls:
-            return True
-        if "mailto:" in self.check_url:
+                if errors >= config.nav_retries or not self.drivers.healthy(browser):
+                    raise
+                errors += 1
+                xlogging(4, f"Page errored, waiting {5 * 2 ** errors} seconds before trying again")
+                metrics.count("retries")
+                time.sleep(5 * 2 ** errors)
+
+    def navigate(self, url, browser):
+        """ Loads a url, with pageload:none the old document is marked first so it is not mistaken for the new one """
+        with metrics.stage("navigation"):
+            if config.page_load == "none":
+                browser.execute_script(MARK_DOCUMENT_SCRIPT)
+            browser.get(url)
+
+    def wait_for_links(self, url, browser):
+        """ Waits until the page's anchors stop changing, for at most the number of seconds set in the runtime argument
+        'linktimeout', so pages loaded with pageload:eager or pageload:none are read once their links are in place """
+        if config.link_timeout is None:
+            return
+        deadline = time.monotonic() + config.link_timeout
+        with metrics.stage("link_wait"):
+            while time.monotonic() < deadline:
+                remaining_ms = int((deadline - time.monotonic()) * 1000)
+                try:
+                    if browser.execute_async_script(WAIT_FOR_LINKS_SCRIPT, LINKS_QUIET_MS, remaining_ms) is not None:
+                        return
+                except TimeoutException:
+                    break
+                except WebDriverException as e:
+                    if not any(error in (e.msg or "").lower() for error in DOCUMENT_UNLOADED_ERRORS):
+                        raise
+                    # The document was replaced while waiting, wait on the new one
+        xlogging(3, f"Links on {url} were still changing after {config.link_timeout} second(s), reading them anyway")
+
+    def visited(self, url):
+        """ Returns true if the url is in the visited urls, otherwise marks it as visited """
+        if "mailto:" in url:
             return True
+        return not self.visited_urls.add_if_new(url)
+
+    def carry_over_clicks(self, old_browser, new_browser):
+        """ Called by the driver pool once a recycled browser's cookies are restored, the cookie policy and disclaimer
+        are remembered by the cookies so they are not clicked again in the new browser """
+        for clicked in (self.cookie_policy_dismissed, self.disclaimer_accepted):
+            if old_browser in clicked:
+                clicked.discard(old_browser)
+                clicked.add(new_browser)
 
-    def dismiss_cookie_policy(self):
+    def dismiss_cookie_policy(self, browser):
         """ Clicks an element using the xpath provided in the run time argument for cookie
-        if the argument is populated and element is not already clicked """
-        if not self.cookie_policy_dismissed and get_arg("cookie"):
+        if the argument is populated and element is not already clicked in this browser """
+        if browser not in self.cookie_policy_dismissed and config.cookie:
             try:
                 time.sleep(5)
-                Element(get_arg("cookie"), 5).clickable().click()
-                self.cookie_policy_dismissed = True
+                Element(config.cookie, 5, browser).clickable().click()
+                self.cookie_policy_dismissed.add(browser)
             except TimeoutException:
                 xlogging(2, "Cannot find cookie policy, continuing")
 
-    def accept_disclaimer(self):
+    def accept_disclaimer(self, browser):
         """ Clicks an element using the xpath provided in the run time argument for disclaimer
-         if the argument is populated and element is not already clicked """
-        if not self.disclaimer_accepted and get_arg("disclaimer"):
+         if the argument is populated and element is not already clicked in this browser """
+        if browser not in self.disclaimer_accepted and config.disclaimer:
             try:
-                Element(get_arg("disclaimer")).presence().click()
-                self.disclaimer_accepted = True
+                Element(config.disclaimer, browser=browser).presence().click()
+                self.disclaimer_accepted.add(browser)
             except TimeoutException:
                 xlogging(2, "Cannot find disclaimer, continuing")
 
-    def move_screenshot(self):
-        """ Moved a screenshot from the domains folder to another based on the domain specifying error """
-        save_folder = get_arg("url").split("://")[1].replace("/", "").replace('.', '-')
-        filename = f"{self.check_url.replace(get_arg('url'), '').replace('/', '_').replace('.', '-')}.png"
-
-        if not os.path.isdir(os.path.join(StepCounter.path_root, save_folder + "__error_pages")):
-            os.mkdir(os.path.join(StepCounter.path_root, save_folder + "__error_pages"))
+    def capture_failure(self, url, parent_url, browser=None):
+        """ Screenshots the referrer with the broken link highlighted, the image is written in the background
+        :param browser: Driver already held by the caller, otherwise one is borrowed from the pool
+        """
+        if self.screenshots is None or parent_url is None:
+            return
+        if browser is None:
+            try:
+                with self.drivers.borrow() as browser:
+                    return self.capture_failure(url, parent_url, browser)
+            except WebDriverException:  # No browser could be launched, the broken link is still reported
+                xlogging(4, f"Unable to screenshot the link to {url} on {parent_url}")
+                return
 
-        shutil.move(
-            os.path.join(StepCounter.path_root, save_folder, filename),
-            os.path.join(StepCounter.path_root, save_folder + "__error_pages", filename),
-        )
+        self.rate_limiter.acquire(parent_url)
+        try:
+            with metrics.stage("screenshot"):
+                self.navigate(parent_url, browser)
+                self.wait_for_links(parent_url, browser)
+                # The broken url is normalised, so the anchors are matched after normalising their hrefs the same way
+                hrefs = [href for href in browser.execute_script(ANCHOR_HREFS_SCRIPT) if self.normalizer.normalize(href) == url]
+                if not hrefs or not browser.execute_script(HIGHLIGHT_LINK_SCRIPT, hrefs):
+                    xlogging(3, f"Unable to find the link to {url} on {parent_url} to highlight it")
+                self.screenshots.capture(browser, error_image_path(url), lambda: self.captured.add(url))
+        except WebDriverException:
+            xlogging(4, f"Unable to screenshot the link to {url} on {parent_url}")
+
+    def screenshot_path(self, url):
+        """ Waits for the screenshot of a broken url to be written
+        :return: Path of the image, or None if the url has no screenshot
+        :rtype: String
+        """
+        if self.screenshots is None:
+            return None
+        path = error_image_path(url)
+        self.screenshots.wait(path)
+        return path if url in self.captured else None
 
-    def remove_image(self):
-        """ Deleted an image from the domains folder """
-        if not self.base_url:
-            image_save_folder = get_arg("url").split("://")[1].replace("/", "").replace('.', '-')
-            try:
-                os.chmod(
-                    f"{StepCounter.path_root}\\{image_save_folder}\\{self.check_url.replace(get_arg('url'), '').replace('/', '_').replace('.', '-')}.png", 0o777
-                )
-                os.remove(
-                    f"{StepCounter.path_root}\\{image_save_folder}\\{self.check_url.replace(get_arg('url'), '').replace('/', '_').replace('.', '-')}.png"
-                )
-            except FileNotFoundError:
-                xlogging(
-                    4,
-                    f"Unable to remove: {StepCounter.path_root}\\{image_save_folder}\\{self.check_url.replace(get_arg('url'), '').replace('/', '_').replace('.', '-')}.png",
-                )
-
-    def bad_page_response(self):
+    def bad_page_response(self, url, parent_url, browser):
         """ Checks for 4## or 5## HTTP response codes """
-        response_codes = driver.iter_requests()
-        for response in response_codes:
-            if str(response) == self.check_url:
-                if str(response.response)[0] == "4" or str(response.response)[0] == "5":
-                    xlogging(2, f"Response '{response.response}' for url:{self.check_url} from referer: {self.parent_url}")
-                    self.broken_links_info.append([response.response, self.check_url, self.parent_url])
-                    self.move_screenshot()
-                    return True
-                else:
-                    self.remove_image()
-                    return False
+        with metrics.stage("status_lookup"):
+            status = browser.status_index.status(url)
+            browser.status_index.clear()  # The status has been indexed, captured traffic is no longer needed
+
+        if status is None:
+            return None
+        if str(status)[0] == "4" or str(status)[0] == "5":
+            xlogging(2, f"Response '{status}' for url:{url} from referer: {parent_url}")
+            metrics.count("errors")
+            self.record_status(url, status, parent_url)
+            self.capture_failure(url, parent_url, browser)
+            self.broken_links_info.append([status, url, parent_url])  # After the screenshot is queued, see screenshot_path
+            return True
+        else:
+            self.record_status(url, status, parent_url)
+            return False
+
+    def record_status(self, url, status, parent_url):
+        """ Saves a status found in the browser to the url store if one is in use """
+        if self.url_store is not None:
+            self.url_store.record(url, status, parent_url)
+
+    def fast_status_check(self, url, parent_url, depth):
+        """ Checks the HTTP response code without the browser, pages are only rendered when their links are needed
+        or when they are marked as JS dependent in the runtime argument 'jspages'
+        :return: The links to follow if the page has been fully handled and does not need to be rendered, otherwise None
+        :rtype: Set
+        """
+        if self.http_checker is None or depth == 0 or self.js_dependent(url):
+            return None
+
+        with metrics.stage("status_lookup"):
+            if self.url_store is not None:
+                status, content_type, unchanged_links = self.conditional_check(url, parent_url, depth)
+            else:
+                status, content_type = self.http_checker.check(url)
+                unchanged_links = None
+        metrics.count("pages_checked_over_http")
+
+        if status is None:  # Unreachable over plain HTTP, let the browser try and report it
+            return None
+
+        if str(status)[0] == "4" or str(status)[0] == "5":
+            xlogging(2, f"Response '{status}' for url:{url} from referer: {parent_url}")
+            metrics.count("errors")
+            self.capture_failure(url, parent_url)
+            self.broken_links_info.append([status, url, parent_url])  # After the screenshot is queued, see screenshot_path
+            return set()
+
+        if unchanged_links is not None:  # Same content as the previous run so the same links would be found
+            xlogging(2, f"Unchanged since the last run, reusing the links found on: {url}")
+            metrics.count("pages_unchanged")
+            return unchanged_links
+
+        if self.at_max_depth(depth) or "html" not in content_type:  # No links will be gathered from this page
+            return set()
+
+        return None
+
+    def conditional_check(self, url, parent_url, depth):
+        """ Checks a url against what the url store recorded for it on a previous run, pages whose links are needed are
+        fetched with a conditional GET so a 304 or an unchanged content hash means the stored links can be reused
+        :return: [response code, content type, internal links if the page is unchanged otherwise None]
+        :rtype: List
+        """
+        if self.at_max_depth(depth):
+            status, content_type = self.http_checker.check(url)
+            self.url_store.record(url, status, parent_url, content_type)
+            return [status, content_type, None]
+
+        previous = self.url_store.get(url)
+        if previous is None:
+            previous = [None, None, None, None, None]
+        previous_status, previous_content_type, previous_etag, previous_last_modified, previous_hash = previous
+
+        status, content_type, etag, last_modified, content_hash = self.http_checker.fetch(url, previous_etag, previous_last_modified)
+        if status is None:
+            return [None, None, None]
+
+        unchanged = previous_status is not None and (status == 304 or (content_hash is not None and content_hash == previous_hash))
+        if status == 304:
+            status, content_type = previous_status, previous_content_type
+        self.url_store.record(url, status, parent_url, content_type, etag, last_modified, content_hash)
+
+        links = self.url_store.links(url) if unchanged else None
+        if links is None:
+            return [status, content_type, None]
+
+        internal_links, external_links, assets = links
+        for href in external_links:
+            if href in self.external_urls:
+                continue
+            self.external_urls.add(href)
+            if self.external_checker is not None:
+                self.external_checker.submit(href, url)
+        if self.asset_checker is not None:
+            for src in assets:
+                self.asset_checker.submit(src, url)
+        internal_links = {href for href in internal_links if href not in self.visited_urls}
+        self.internal_urls.update(internal_links)
+        return [status, content_type, internal_links]
+
+    def js_dependent(self, href):
+        """ Checks if any of the fragments provided in the runtime argument 'jspages' are in the href
+        :param href: URL path to parse
+        :type href: String
+        :return: True/False
+        :rtype: Bool
+        """
+        if not self.js_partials:
+            return False
+        for part in self.js_partials:
+            if part in href:
+                return True
+        return False
+
+    def at_max_depth(self, depth):
+        """ Returns true if the depth set in the runtime argument 'maxdepth' has been reached """
+        return config.max_depth is not None and depth >= config.max_depth
 
     def custom_ignore(self, href):
         """ Checks if any of the fragments provided in the runtime argument 'ignore' are in the href
@@ -176,117 +454,325 @@ class Scraper:
                 return True
         return False
 
-    def get_all_website_links(self, url, parent_url):
+    def robots_allowed(self, url):
+        """ Returns false if the runtime argument 'robots' is set to y and robots.txt disallows the url """
+        if not config.robots or self.seeder.allowed(url):
+            return True
+        xlogging(2, f"Skipping url disallowed by robots.txt: {url}")
+        return False
+
+    def sitemap_seeds(self):
+        """ Streams internal page urls from the sitemaps set in the runtime argument 'sitemap', either y to use the
+        ones listed in robots.txt or a '|' separated list of sitemap urls
+        :return: Generator of [url, sitemap, depth] frontier entries
+        """
+        domain_name = urlparse(self.normalizer.normalize(self.url)).netloc
+        sitemap_urls = None if config.sitemap == "y" else config.sitemap.split("|")
+        for loc, sitemap_url in self.seeder.urls(sitemap_urls):
+            href = self.normalizer.normalize(loc)
+            if href is None or domain_name not in href or href in self.visited_urls:
+                continue
+            yield [href, sitemap_url, 1]
+
+    def get_all_website_links(self, url, parent_url, depth):
         """ Returns all URLs that is found on `url` in which it belongs to the same website """
-        self.check_url = url
-        self.parent_url = parent_url
-        urls = set()
-        domain_name = urlparse(self.url).netloc
+        if self.visited(url):
+            return
 
-        if self.visited():
+        if depth != 0 and not self.robots_allowed(url):
             return
 
-        self.go_to_url()  # Go to url and handle network errors where possible
-        self.visited_urls.add(self.check_url)
+        links = self.fast_status_check(url, parent_url, depth)
+        if links is not None:  # Status known over HTTP and the page does not need rendering
+            return links
 
-        if get_arg("url") not in driver.current_url:
-            return
+        for attempt in range(2):  # A page that crashes the browser gets one more go in a fresh one
+            try:
+                with self.drivers.borrow(fresh=attempt > 0) as browser:
+                    return self.render_page_links(url, parent_url, depth, browser)
+            except WebDriverException as e:  # The pool replaces a crashed browser before lending it out again
+                metrics.count("errors")
+                xlogging(4, f"Browser failed on {url}, attempt {attempt + 1} of 2: {e.msg}")
+        xlogging(4, f"UNABLE TO VISIT: {url} FROM: {parent_url}")
+        self.broken_links_info.append([None, url, parent_url])
+
+    def render_page_links(self, url, parent_url, depth, browser):
+        """ Renders `url` in a borrowed browser and returns the URLs found on it that belong to the same website """
+        urls = set()
+        external_urls = set()  # external links first found on this page
+        domain_name = urlparse(self.normalizer.normalize(self.url)).netloc
 
-        if not self.base_url:
-            if self.bad_page_response():
-                return
+        self.go_to_url(url, parent_url, browser)  # Go to url and handle network errors where possible
+        metrics.count("pages_rendered")
+        self.wait_for_links(url, browser)
 
-        self.dismiss_cookie_policy()
-        self.accept_disclaimer()
+        if self.url not in browser.current_url:
+            return
 
-        if get_arg("maxdepth"):
-            if self.depth == int(get_arg("maxdepth")):
+        if depth != 0:
+            if self.bad_page_response(url, parent_url, browser):
                 return
 
-        try:
-            hrefs = WebDriverWait(driver, 0, poll_frequency=0).until(ec.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href]")))
-        except TimeoutException:
-            xlogging(3, f"no a tags with href found at {self.check_url}")
+        self.dismiss_cookie_policy(browser)
+        self.accept_disclaimer(browser)
+
+        if self.at_max_depth(depth):
             return
 
-        for href in hrefs:
-            try:
-                href_element = href
-                href = href.get_attribute("href")
-            except StaleElementReferenceException:
-                continue
+        started = time.perf_counter()
+        page = browser.execute_script(GATHER_LINKS_SCRIPT)  # Every anchor and asset on the page in a single round trip
+        links = page["links"]
+        page_assets = self.check_assets(page["assets"], url)
+        if not links:
+            xlogging(3, f"no a tags with href found at {url}")
+
+        # every link on the page, before the crawl wide dedupe, so the url store can replay the page on the next run
+        page_links, page_external = set(), set()
+
+        for link in links:
+            href = link["absolute"]
             if href == "" or href is None:
                 continue
 
-            if href in self.hrefs:
+            first_seen = self.hrefs.add_if_new(href)
+            if not first_seen and self.url_store is None:
                 continue
 
-            self.hrefs.add(href)
-
             if self.custom_ignore(href):
                 continue
 
-            href = urljoin(url, href)
-            parsed_href = urlparse(href)
-            href = parsed_href.scheme + "://" + parsed_href.netloc + parsed_href.path
-
-            if href in self.visited_urls:
-                continue
-            if href in self.external_urls:
+            href = self.normalizer.normalize(href)  # None for anything that is not a http(s) url
+            if href is None:
                 continue
 
-            if not self.is_valid(href):
+            if self.url_store is not None:
+                if is_file_link(href) or link["download"]:
+                    page_assets.add(href)
+                elif domain_name not in href:
+                    page_external.add(href)
+                else:
+                    page_links.add(href)
+            if not first_seen:
                 continue
 
-            if href[-4] == ".":
+            if href in self.visited_urls:
+                continue
+            if href in self.external_urls:
                 continue
 
-            if href[-5] == ".":
+            if is_file_link(href) or link["download"]:  # Downloads are checked like assets rather than crawled
+                if self.asset_checker is not None:
+                    self.asset_checker.submit(href, url)
                 continue
 
             if domain_name not in href:
                 xlogging(2, f"{GRAY}[!] External link: {href}{RESET}")
                 self.external_urls.add(href)
+                external_urls.add(href)
+                if self.external_checker is not None:
+                    self.external_checker.submit(href, url)
                 continue
 
             xlogging(2, f"{GREEN}[*] Internal link: {href}{RESET}")
-            xlogging(2, f"Location in referrer: {href_element.location}")
-
-            driver.execute_script("arguments[0].style.border='3px solid red'", href_element)
-            StepCounter().take_screenshot(href.replace(get_arg("url"), "").replace("/", "_").replace('.', '-'), True)
-            driver.execute_script("arguments[0].style.border='0px solid red'", href_element)
+            xlogging(2, f"Location in referrer: {{'x': {link['x']}, 'y': {link['y']}}} text: {link['text']}")
 
             urls.add(href)
             self.internal_urls.add(href)
 
-        self.base_url = False
-
-        return urls
-
-    def _crawl(self, url, parent_url):
-        """Loops through the returned list of urls which are each looped through to get a returned list of urls for each
-        which are each looped through to get a returned list of urls for each
-        which are each looped through to get a returned list of urls for each recursively."""
+        metrics.observe("link_extraction", time.perf_counter() - started)
+        metrics.count("links_internal", len(urls))
+        metrics.count("links_external", len(external_urls))
 
-        xlogging(2, f"{YELLOW}[*] Crawling at depth {str(self.depth).ljust(3)}| {url}{RESET}")
-        links = self.get_all_website_links(url, parent_url)  # Get links (after filtering) from current url
+        if self.url_store is not None:
+            with metrics.stage("disk_io"):
+                self.url_store.set_links(url, page_links, page_external, page_assets)
 
-        if links is None:  # Leave
-            self.depth -= 1
-            return
-
-        for link in links:
-            if get_arg("maxdepth"):
-                if self.depth == int(get_arg("maxdepth")):  # Leave
-                    self.depth -= 1
-                    return
+        return urls
 
-            self.depth += 1
-            self._crawl(link, url)  # Go deeper
+    def check_assets(self, assets, url):
+        """ Queues the images, scripts, stylesheets and media found on `url` to be checked, each unique asset is only
+        checked once across the whole site
+        :return: The normalised asset urls
+        :rtype: Set
+        """
+        normalized = set()
+        for src in assets:
+            if self.custom_ignore(src):
+                continue
+            src = self.normalizer.normalize(src)  # None for data: and blob: urls
+            if src is None:
+                continue
+            normalized.add(src)
+            if self.asset_checker is not None:
+                self.asset_checker.submit(src, url)
+        metrics.count("links_assets", len(normalized))
+        return normalized
+
+    def save_checkpoint(self, frontier, pending):
+        """ Writes everything needed to carry on the crawl to the checkpoint file, pages that are still being worked on
+        are saved back onto the frontier and left out of the visited urls so they are redone on resume """
+        in_progress = list(pending.values())
+        in_progress_urls = {url for url, parent_url, depth in in_progress}
+        state = {
+            "frontier": list(frontier) + in_progress,
+            "visited_urls": self.visited_urls.dump(exclude=in_progress_urls),
+            "internal_urls": self.internal_urls.dump(),
+            "broken_links_info": list(self.broken_links_info),
+        }
+        if self.external_checker is not None:
+            state["external"] = self.external_checker.snapshot()
+        if self.asset_checker is not None:
+            state["assets"] = self.asset_checker.snapshot()
+        with metrics.stage("disk_io"):
+            self.checkpoint.save(state)
+        xlogging(2, f"Checkpoint saved with {len(state['frontier'])} url(s) left to crawl")
+
+    def load_checkpoint(self):
+        """ Restores the state saved by a previous run
+        :return: The [url, referrer, depth] entries of the frontier to carry on from, or None if there is no
+        checkpoint to resume
+        :rtype: List
+        """
+        state = self.checkpoint.load()
+        if state is None:
+            xlogging(3, f"No checkpoint found at {self.checkpoint.path}, starting a new crawl")
+            return None
+
+        self.visited_urls.load(state["visited_urls"])
+        self.internal_urls.load(state["internal_urls"])
+        self.broken_links_info.extend(state["broken_links_info"])  # Includes the broken external links found so far
+        if "external" in state:
+            self.external_urls.load(state["external"]["checked"])  # Dumped by a url set of the same backend
+            self.external_urls.update(url for url, referrer in state["external"]["outstanding"])
+            if self.external_checker is not None:
+                self.external_checker.restore(state["external"])
+        if "assets" in state and self.asset_checker is not None:
+            self.asset_checker.restore(state["assets"])
+
+        xlogging(2, f"Resuming from checkpoint with {len(state['frontier'])} url(s) left to crawl")
+        return state["frontier"]
+
+    def out_of_budget(self):
+        """ Returns true once the number of pages set in the runtime argument 'maxpages' have been started or the
+        number of seconds set in the runtime argument 'deadline' have passed """
+        if config.max_pages is not None and self.pages_started >= config.max_pages:
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _crawl(self, frontier, seeds=None):
+        """Works through a Frontier of [url, referrer, depth] entries with a pool of workers, each worker gathers the
+        links of one page which are pushed back onto the frontier one level deeper until the frontier is empty.
+        Seeds are streamed in whenever the frontier runs dry so workers are never left idle.
+        Once the page or time budget is used up no new pages are started and the pages in progress are finished.
+        Yields each broken link as soon as the page it was found on has been processed.
+        :return: True if seeds were left over when the crawl stopped"""
+        pending = {}
+        finished = False
 
-        self.depth -= 1  # Leave
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while pending or ((frontier or seeds is not None) and not self.out_of_budget()):
+                    while len(pending) < self.workers and not self.out_of_budget():
+                        if frontier:
+                            url, parent_url, depth = frontier.pop()  # Highest priority first, see base/frontier.py
+                        elif seeds is not None:
+                            seed = next(seeds, None)
+                            if seed is None:
+                                seeds = None
+                                continue
+                            url, parent_url, depth = seed
+                        else:
+                            break
+                        xlogging(2, f"{YELLOW}[*] Crawling at depth {str(depth).ljust(3)}| {url}{RESET}")
+                        self.pages_started += 1
+                        pending[executor.submit(self.get_all_website_links, url, parent_url, depth)] = [url, parent_url, depth]
+
+                    if not pending:
+                        continue
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, parent_url, depth = pending.pop(future)
+                        links = future.result()  # Get links (after filtering) from url
+                        if links is None:
+                            continue
+                        for link in links:
+                            frontier.push([link, url, depth + 1])
+                    yield from self.new_results()
+
+                    if self.checkpoint is not None and self.checkpoint.due():
+                        self.save_checkpoint(frontier, pending)
+            finished = True
+        finally:
+            if self.checkpoint is not None and not finished:
+                self.save_checkpoint(frontier, pending)
+        return seeds is not None
+
+    def new_results(self):
+        """ Yields the broken links found since the last call """
+        while self.reported < len(self.broken_links_info):
+            self.reported += 1
+            yield self.broken_links_info[self.reported - 1]
+
+    def iter_crawl(self):
+        """Triggers the crawler and yields each [response code, url, referrer] of a broken link as soon as it is found"""
+        frontier = Frontier(config.order, config.weights, config.failure_weight, self.url_store)
+        entries = None
+        if self.checkpoint is not None and config.resume:
+            entries = self.load_checkpoint()
+        frontier.extend(entries if entries is not None else [[self.normalizer.normalize(self.url), None, 0]])
+        if config.deadline is not None:
+            self.deadline = time.monotonic() + config.deadline
+
+        seeds = None
+        if self.seeder is not None:
+            self.seeder.load_robots()
+            if config.sitemap:
+                seeds = self.sitemap_seeds()
+
+        yield from self.new_results()  # Broken links restored from a checkpoint
+        finished = False
+        try:
+            seeds_left = yield from self._crawl(frontier, seeds)
+            finished = True
+        finally:
+            self.drivers.close()
+            if self.url_store is not None:
+                self.url_store.close()
+            if not finished:  # Stopped early, e.g. by failfast, so the checks still queued are dropped
+                if self.external_checker is not None:
+                    self.external_checker.results(cancel=True)
+                if self.asset_checker is not None:
+                    self.asset_checker.results(cancel=True)
+                if self.screenshots is not None:  # The writer thread is a daemon, queued screenshots are lost at exit
+                    self.screenshots.close()
+                self.close_url_sets()
+        partial = self.out_of_budget() and (len(frontier) > 0 or seeds_left)  # pages were left unchecked
+        if partial:
+            xlogging(3, f"Crawl budget used up after {self.pages_started} page(s), {len(frontier)} url(s) were not checked")
+        if self.external_checker is not None:
+            self.external_checker.results(cancel=partial)  # Wait for the outstanding external checks
+        if self.asset_checker is not None:
+            self.asset_checker.results(cancel=partial)
+        yield from self.new_results()
+        if self.screenshots is not None:
+            self.screenshots.close()
+        if self.checkpoint is not None and partial:
+            self.save_checkpoint(frontier, {})  # The rest of the site can be crawled later with resume:y
+        elif self.checkpoint is not None:
+            self.checkpoint.remove()
+        self.close_url_sets()
+
+    def close_url_sets(self):
+        """Releases every url set once the crawl is over, the files of disk backed sets are deleted"""
+        for url_set in (self.internal_urls, self.external_urls, self.visited_urls, self.hrefs):
+            url_set.close()
+        if self.external_checker is not None:
+            self.external_checker.close()
+        if self.asset_checker is not None:
+            self.asset_checker.close()
 
     def crawl(self):
         """Triggers the crawler to start gathering broken links"""
-        self._crawl(self.url, None)
+        for _ in self.iter_crawl():
+            pass
         return self.broken_links_info
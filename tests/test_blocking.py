@@ -0,0 +1,77 @@
+import pytest
+
+from base.blocking import BlockingProfile
+
+
+def test_extensions_are_matched_on_the_path_only():
+    profile = BlockingProfile(["images"])
+    assert profile.blocks("https://example.com/logo.png")
+    assert profile.blocks("https://example.com/photo.JPG?w=200")
+    assert not profile.blocks("https://example.com/view?file=a.jpg")
+    assert not profile.blocks("https://example.com/png")
+
+
+def test_hosts_and_their_subdomains_are_blocked():
+    profile = BlockingProfile(["analytics"], ["tracker.example"])
+    assert profile.blocks("https://www.google-analytics.com/collect")
+    assert profile.blocks("https://cdn.tracker.example:8443/t.js")
+    assert not profile.blocks("https://nottracker.example/")
+    assert not profile.blocks("https://example.com/?ref=hotjar.com")
+
+
+def test_all_and_unknown_categories():
+    profile = BlockingProfile(["all"])
+    assert profile.blocks("https://example.com/font.woff2") and profile.blocks("https://doubleclick.net/ad")
+    with pytest.raises(Exception, match="Unknown 'block' categories"):
+        BlockingProfile(["videos"])
+
+
+def test_empty_profile_is_falsy():
+    assert not BlockingProfile()
+    assert not BlockingProfile().blocks("https://example.com/logo.png")
+
+
+def test_url_patterns():
+    patterns = BlockingProfile(["images"], ["tracker.example"]).url_patterns()
+    assert "*.png" in patterns and "*.png?*" in patterns
+    assert "*://tracker.example/*" in patterns and "*://*.tracker.example/*" in patterns
+
+
+class ProxyBrowser:
+    """Stands in for a selenium-wire driver"""
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+        self.request_interceptor = None
+
+
+def test_interceptor_fallback_widens_the_scopes_to_the_blocked_hosts():
+    browser = ProxyBrowser(".*example.com.*")
+    profile = BlockingProfile(["ads"])
+    profile.apply(browser, "Firefox")
+    assert browser.request_interceptor == profile.interceptor
+    assert browser.scopes == [".*example.com.*", profile.host_regex]
+
+
+def test_interceptor_fallback_leaves_unscoped_proxies_alone():
+    browser = ProxyBrowser([])
+    BlockingProfile(["ads"]).apply(browser, "Firefox")
+    assert browser.scopes == []
+
+
+class DevToolsBrowser:
+    """Stands in for a Chrome driver with DevTools access"""
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, parameters):
+        self.commands.append([command, parameters])
+
+
+def test_chrome_blocks_urls_through_devtools():
+    pytest.importorskip("selenium")
+    browser = DevToolsBrowser()
+    profile = BlockingProfile(["fonts"])
+    profile.apply(browser, "Chrome")
+    assert browser.commands == [["Network.enable", {}], ["Network.setBlockedURLs", {"urls": profile.url_patterns()}]]
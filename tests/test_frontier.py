@@ -0,0 +1,53 @@
+import pytest
+
+from base.frontier import Frontier
+
+
+def drain(frontier):
+    return [frontier.pop()[0] for _ in range(len(frontier))]
+
+
+def test_bfs_goes_level_by_level_first_in_first_out():
+    frontier = Frontier("bfs")
+    frontier.extend([["/b", "/", 2], ["/a1", "/", 1], ["/a2", "/", 1]])
+    assert drain(frontier) == ["/a1", "/a2", "/b"]
+
+
+def test_dfs_goes_deepest_first_last_in_first_out():
+    frontier = Frontier("dfs")
+    frontier.extend([["/a1", "/", 1], ["/a2", "/", 1], ["/b", "/a1", 2]])
+    assert drain(frontier) == ["/b", "/a2", "/a1"]
+
+
+def test_weights_move_urls_forward_and_back():
+    frontier = Frontier("bfs", weights=[["/blog/", 5], ["/products/", -5]])
+    frontier.extend([["/blog/post", "/", 1], ["/about", "/", 1], ["/products/deep", "/", 3]])
+    assert drain(frontier) == ["/products/deep", "/about", "/blog/post"]
+
+
+class PreviousRun:
+    """Stands in for the UrlStore, only the status is read"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    def get(self, url):
+        return [self.statuses[url]] if url in self.statuses else None
+
+
+def test_failure_weight_brings_broken_urls_forward():
+    frontier = Frontier("bfs", failure_weight=10, url_store=PreviousRun({"/broken": 404, "/unreachable": None, "/fine": 200}))
+    frontier.extend([["/fine", "/", 1], ["/broken", "/", 3], ["/new", "/", 1], ["/unreachable", "/", 4]])
+    assert drain(frontier) == ["/broken", "/unreachable", "/fine", "/new"]
+
+
+def test_iteration_matches_pop_order_and_keeps_the_entries():
+    frontier = Frontier("bfs")
+    frontier.extend([["/b", "/", 2], ["/a", "/", 1]])
+    assert list(frontier) == [["/a", "/", 1], ["/b", "/", 2]]
+    assert len(frontier) == 2
+
+
+def test_unknown_order():
+    with pytest.raises(Exception, match="order"):
+        Frontier("random")
@@ -0,0 +1,64 @@
+import time
+
+from base.rate_limiter import HostRateLimiter, retry_after_seconds
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("3") == 3
+    assert retry_after_seconds("-1") == 0
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0  # dates in the past do not wait
+
+
+def test_starting_rate_is_capped_by_max_rate():
+    assert HostRateLimiter(rate=50, max_rate=5).start_rate == 5
+    assert HostRateLimiter(max_rate=5).start_rate == 5
+
+
+def test_healthy_host_ramps_up_to_max_rate():
+    limiter = HostRateLimiter(rate=1, max_rate=1.25)
+    for _ in range(10):
+        limiter.feedback("https://example.com/a", 200, 0.1)
+    assert limiter.buckets["example.com"].rate == 1.25
+
+
+def test_errors_and_slow_responses_slow_down():
+    limiter = HostRateLimiter(rate=4, max_rate=4)
+    limiter.feedback("https://example.com/a", 500, 0.1)
+    assert limiter.buckets["example.com"].rate == 3
+    limiter.feedback("https://example.com/a", 200, 5)  # well over three times the fastest response
+    assert limiter.buckets["example.com"].rate == 2.25
+
+
+def test_throttled_host_backs_off_and_halves_its_rate():
+    limiter = HostRateLimiter(rate=4, max_rate=4)
+    limiter.feedback("https://example.com/a", 429, 0.1, "30")
+    bucket = limiter.buckets["example.com"]
+    assert bucket.rate == 2
+    assert bucket.blocked_until - time.monotonic() > 29
+    assert limiter.throttled(503) and not limiter.throttled(404)
+
+
+def test_rate_never_drops_below_min_rate():
+    limiter = HostRateLimiter(rate=1, max_rate=1, min_rate=0.5)
+    for _ in range(5):
+        limiter.feedback("https://example.com/a", 503)
+    assert limiter.buckets["example.com"].rate == 0.5
+
+
+def test_hosts_have_their_own_buckets():
+    limiter = HostRateLimiter(rate=1, max_rate=1)
+    started = time.monotonic()
+    limiter.acquire("https://a.example.com/")
+    limiter.acquire("https://b.example.com/")  # a different host is not held up by the first one
+    assert time.monotonic() - started < 0.5
+    assert set(limiter.buckets) == {"a.example.com", "b.example.com"}
+
+
+def test_acquire_waits_for_the_next_token():
+    limiter = HostRateLimiter(rate=10, max_rate=10)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire("https://example.com/")
+    assert time.monotonic() - started >= 0.15
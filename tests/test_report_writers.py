@@ -0,0 +1,52 @@
+import csv
+import json
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from base.report_writers import CsvWriter, JsonlWriter, JUnitWriter, new_report_writers
+
+RESULTS = [[404, "https://example.com/missing", "https://example.com/", "shot.png"], [None, "https://down.example/", None, None]]
+
+
+def write(writer):
+    for status, url, referrer, image in RESULTS:
+        writer.write(status, url, referrer, image)
+    writer.close()
+
+
+def test_jsonl(tmp_path):
+    path = tmp_path / "report.jsonl"
+    write(JsonlWriter(str(path)))
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [[r["status"], r["url"], r["referrer"], r["image"]] for r in records] == RESULTS
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "report.csv"
+    write(CsvWriter(str(path)))
+    rows = list(csv.reader(path.open(newline="")))
+    assert rows[0] == ["time", "status", "url", "referrer", "image"]
+    assert rows[1][1:] == ["404", "https://example.com/missing", "https://example.com/", "shot.png"]
+    assert rows[2][1:] == ["", "https://down.example/", "", ""]
+
+
+def test_junit_is_valid_xml_with_a_failure_per_result(tmp_path):
+    path = tmp_path / "report.xml"
+    writer = JUnitWriter(str(path))
+    writer.write(404, "https://example.com/?a=1&b=<2>", 'https://example.com/"quoted"')
+    writer.write(None, "https://down.example/", None)
+    writer.close()
+    cases = ElementTree.parse(path).getroot().findall("./testsuite/testcase")
+    assert [case.get("name") for case in cases] == ["https://example.com/?a=1&b=<2>", "https://down.example/"]
+    assert cases[0].get("classname") == 'https://example.com/"quoted"'
+    assert [case.find("failure").get("message") for case in cases] == ["Response 404", "Unable to visit"]
+
+
+def test_writers_are_chosen_by_extension(tmp_path):
+    writers = new_report_writers(f"{tmp_path / 'a.jsonl'}|{tmp_path / 'b.CSV'}|{tmp_path / 'c.xml'}")
+    assert [type(writer) for writer in writers] == [JsonlWriter, CsvWriter, JUnitWriter]
+    for writer in writers:
+        writer.close()
+    with pytest.raises(Exception, match="Unknown report format"):
+        new_report_writers(str(tmp_path / "report.txt"))
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from base.config import Config, config
+from base.custom_logging import StepCounter
+from base.screenshots import ScreenshotWriter, error_image_path
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "url", "https://example.com")
+    monkeypatch.setattr(config, "image_format", "png")
+    monkeypatch.setattr(StepCounter, "path_root", str(tmp_path))
+    return tmp_path
+
+
+class Browser:
+    """Stands in for a driver, only the screenshot is taken"""
+
+    def get_screenshot_as_png(self):
+        return b"\x89PNG"
+
+
+def test_image_paths_can_be_written_on_any_platform(site):
+    first = error_image_path("https://example.com/search?q=a:b&page=2")
+    second = error_image_path("https://example.com/search?q=a-b&page=2")
+    assert first != second
+    for path in (first, second):
+        name = os.path.basename(path)
+        assert not set(name) & set('?&:*"<>|\\/')
+        assert name.endswith(".png")
+
+
+def test_later_screenshots_are_written_after_one_fails(site):
+    writer = ScreenshotWriter()
+    written = []
+    bad = str(site / "not_a_folder")
+    open(bad, "w").close()  # a file where the folder should be, so the first write fails
+    writer.capture(Browser(), os.path.join(bad, "a.png"), lambda: written.append("a"))
+    writer.capture(Browser(), str(site / "shots" / "b.png"), lambda: written.append("b"))
+    writer.wait(str(site / "shots" / "b.png"))
+    assert written == ["b"]
+    assert (site / "shots" / "b.png").read_bytes() == b"\x89PNG"
+    writer.close()
+
+
+def test_encoding_errors_do_not_stop_the_writer(site, monkeypatch):
+    writer = ScreenshotWriter()
+    monkeypatch.setattr(writer, "_encode", lambda png: {}[png])  # KeyError, as Pillow raises for unknown formats
+    writer.capture(Browser(), str(site / "a.png"))
+    writer.wait(str(site / "a.png"))
+    assert writer.thread.is_alive()
+    writer.close()
+
+
+def test_image_format_is_validated():
+    arguments = ["browser:Chrome", "url:https://example.com"]
+    assert Config(arguments + ["imageformat:JPG"]).image_format == "jpeg"
+    Config(arguments + ["imageformat:webp"]).validate()
+    with pytest.raises(Exception, match="imageformat"):
+        Config(arguments + ["imageformat:gif"]).validate()
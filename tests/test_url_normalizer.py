@@ -0,0 +1,58 @@
+from base.url_normalizer import UrlNormalizer, is_file_link
+
+
+def test_scheme_host_default_port_and_fragment():
+    assert UrlNormalizer().normalize("HTTP://Example.COM:80/a#top") == "http://example.com/a"
+
+
+def test_non_default_port_is_kept():
+    assert UrlNormalizer().normalize("https://example.com:8443/a") == "https://example.com:8443/a"
+
+
+def test_ipv6_host_keeps_its_brackets():
+    normalizer = UrlNormalizer()
+    assert normalizer.normalize("http://[::1]:8080/a") == "http://[::1]:8080/a"
+    assert normalizer.normalize("http://[::1]:80/") == "http://[::1]/"
+
+
+def test_query_is_sorted_and_tracking_keys_dropped():
+    assert UrlNormalizer().normalize("https://example.com/?b=2&utm_source=x&a=1&gclid=y") == "https://example.com/?a=1&b=2"
+
+
+def test_keep_query_and_ignore_query():
+    assert UrlNormalizer(keep_query=["page"]).normalize("https://example.com/?page=2&sort=asc") == "https://example.com/?page=2"
+    assert UrlNormalizer(ignore_query=["session*"]).normalize("https://example.com/?sessionid=1&utm_source=x") == "https://example.com/?utm_source=x"
+
+
+def test_trailing_slash_rules():
+    assert UrlNormalizer(trailing_slash="strip").normalize("https://example.com/a/") == "https://example.com/a"
+    assert UrlNormalizer(trailing_slash="add").normalize("https://example.com/a") == "https://example.com/a/"
+    assert UrlNormalizer(trailing_slash="add").normalize("https://example.com/a.pdf") == "https://example.com/a.pdf"
+    assert UrlNormalizer(trailing_slash="strip").normalize("https://example.com") == "https://example.com/"
+
+
+def test_host_aliases():
+    normalizer = UrlNormalizer(host_aliases={"WWW.example.com": "example.com"})
+    assert normalizer.normalize("https://www.example.com/a") == "https://example.com/a"
+
+
+def test_invalid_urls():
+    normalizer = UrlNormalizer()
+    for url in ("mailto:someone@example.com", "javascript:void(0)", "data:image/png;base64,AA", "https://example.com:abc/"):
+        assert normalizer.normalize(url) is None
+
+
+def test_bad_trailing_slash_rule():
+    try:
+        UrlNormalizer(trailing_slash="sometimes")
+    except Exception as e:
+        assert "trailingslash" in str(e)
+    else:
+        raise AssertionError("expected an exception")
+
+
+def test_is_file_link():
+    assert is_file_link("https://example.com/report.pdf")
+    assert is_file_link("https://example.com/logo.PNG?v=2")
+    assert not is_file_link("https://example.com/page.html")
+    assert not is_file_link("https://example.com/about")
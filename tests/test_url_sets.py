@@ -0,0 +1,103 @@
+import os
+import threading
+
+import pytest
+
+from base.url_sets import BloomUrlSet, DiskUrlSet, FingerprintUrlSet, MemoryUrlSet
+
+
+@pytest.fixture(params=["memory", "fingerprint", "disk", "bloom"])
+def new_set(request, tmp_path):
+    """Makes url sets of one backend, closing them after the test"""
+    created = []
+
+    def new():
+        path = str(tmp_path / f"urls_{len(created)}.db")
+        if request.param == "memory":
+            url_set = MemoryUrlSet()
+        elif request.param == "fingerprint":
+            url_set = FingerprintUrlSet(buffer_size=4)  # small enough for the buffer to be merged
+        elif request.param == "disk":
+            url_set = DiskUrlSet(path)
+        else:
+            url_set = BloomUrlSet(DiskUrlSet(path), capacity=1000)
+        created.append(url_set)
+        return url_set
+
+    yield new
+    for url_set in created:
+        url_set.close()
+
+
+def test_add_if_new(new_set):
+    url_set = new_set()
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    assert all(url_set.add_if_new(url) for url in urls)
+    assert not any(url_set.add_if_new(url) for url in urls)
+    assert len(url_set) == 10
+    assert all(url in url_set for url in urls)
+    assert "https://example.com/other" not in url_set
+
+
+def test_dump_and_load(new_set):
+    url_set = new_set()
+    url_set.update(["https://example.com/a", "https://example.com/b", "https://example.com/c"])
+    dumped = url_set.dump(exclude=["https://example.com/b"])
+    assert len(dumped) == 2
+
+    restored = new_set()
+    restored.load(dumped)
+    assert "https://example.com/a" in restored
+    assert "https://example.com/b" not in restored
+    assert not restored.add_if_new("https://example.com/c")
+
+
+def test_disk_url_set_close_deletes_the_file(tmp_path):
+    path = str(tmp_path / "urls.db")
+    url_set = DiskUrlSet(path)
+    url_set.add("https://example.com/a")
+    assert os.path.exists(path)
+    url_set.close()
+    assert not os.path.exists(path)
+
+
+class CountingSet(MemoryUrlSet):
+    def __init__(self):
+        super().__init__()
+        self.lookups = 0
+
+    def add_if_new(self, url):
+        self.lookups += 1
+        return super().add_if_new(url)
+
+
+def test_bloom_inserts_misses_without_a_backend_lookup():
+    backend = CountingSet()
+    url_set = BloomUrlSet(backend, capacity=1000)
+    assert url_set.add_if_new("https://example.com/a")
+    assert backend.lookups == 0
+    assert not url_set.add_if_new("https://example.com/a")
+    assert backend.lookups == 1
+    assert "https://example.com/a" in backend
+
+
+def test_dump_while_another_thread_adds(new_set):
+    url_set = new_set()
+    url_set.update(f"https://example.com/{i}" for i in range(1000))
+    stop = threading.Event()
+
+    def add():
+        i = 1000
+        while not stop.is_set():
+            url_set.add(f"https://example.com/{i}")
+            url_set.update([f"https://example.com/u{i}"])
+            i += 1
+
+    writer = threading.Thread(target=add)
+    writer.start()
+    try:
+        for _ in range(20):
+            assert len(url_set.dump()) >= 1000
+    finally:
+        stop.set()
+        writer.join()